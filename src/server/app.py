@@ -1,18 +1,20 @@
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from strawberry.fastapi import GraphQLRouter
+from fastapi import FastAPI, Request
 from routes import health, firestore_routes, search, auth
 import firebase_admin
-from firebase_admin import credentials, firestore
-from elasticsearch import Elasticsearch
-from services.es_svc import index_many
+from firebase_admin import credentials
+from services.es_svc import warm_index_registry
+from services.sync_job import start_background_sync, stop_background_sync
+from services.active_job import start_active_refresh, stop_active_refresh
+from services.es_client import create_es_client, bulk_client
 from gql.schema import schema
+from gql.loaders import create_loaders
+from gql.extensions import TracedGraphQLRouter
+from services.trace_svc import TraceMiddleware, TRACING_ENABLED
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_fastapi_instrumentator import Instrumentator
 
-ES_HOST = os.getenv("ELASTICSEARCH_HOST")
-ES_USER = os.getenv("ELASTIC_USER")
-ES_PASS = os.getenv("ELASTIC_PASSWORD")
 # --- Firebase init ---
 cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 if not firebase_admin._apps:
@@ -21,13 +23,38 @@ if not firebase_admin._apps:
     cred = credentials.Certificate(cred_path)
     firebase_admin.initialize_app(cred)
 
-db = firestore.client()
 origins = [
     "http://localhost:3000",
     "https://scholarship-routing.vercel.app"
 ]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 1 ES client (connection pool) dùng chung cho toàn app
+    app.state.es = create_es_client()
+    try:
+        try:
+            # không retry: ES chưa lên thì bỏ qua, registry tự điền dần
+            await warm_index_registry(app.state.es.options(max_retries=0, request_timeout=2))
+        except Exception as e:
+            print(f"⚠️ Could not warm ES index registry: {e}")
+        # Sync Firestore → ES chạy nền, không chặn server nhận request
+        start_background_sync(bulk_client(app.state.es))
+        # Định kỳ tắt cờ `active` của học bổng đã quá hạn
+        start_active_refresh(bulk_client(app.state.es))
+        yield
+    finally:
+        await stop_active_refresh()
+        await stop_background_sync()
+        await app.state.es.close()
+
+
+async def get_graphql_context(request: Request):
+    es = request.app.state.es
+    return {"request": request, "es": es, "loaders": create_loaders(es)}
+
 # --- FastAPI app ---
-app = FastAPI(title="Scholarship Routing API")
+app = FastAPI(title="Scholarship Routing API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -35,46 +62,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# Tracing tắt hoàn toàn (mặc định) → không gắn middleware, request không tốn thêm gì
+if TRACING_ENABLED:
+    app.add_middleware(TraceMiddleware)
+
 app.include_router(health.router, prefix="/health", tags=["health"])
 app.include_router(firestore_routes.router, prefix="/api/v1/firestore", tags=["firestore"])
 app.include_router(search.router, prefix="/api/v1/es", tags=["elasticsearch"])
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
-graphql_router = GraphQLRouter(schema, path="/graphql")
+graphql_router = TracedGraphQLRouter(schema, path="/graphql", context_getter=get_graphql_context)
 app.include_router(graphql_router)
-@app.on_event("startup")
-def sync_all_firestore_collections_to_es():
-    es = Elasticsearch(
-        hosts=[ES_HOST],
-        basic_auth=(ES_USER, ES_PASS),
-        verify_certs=False,
-        max_retries=30,
-        retry_on_timeout=True,
-        request_timeout=30,
-    )
-
-    try:
-        collections = db.collections()  # Lấy tất cả Firestore collections
-        for coll_ref in collections:
-            coll_name = coll_ref.id
-            docs = coll_ref.stream()
-            records = []
-            for doc in docs:
-                data = doc.to_dict()
-                data["id"] = doc.id  # gắn id để tránh trùng
-                records.append(data)
-
-            if records:
-                count = index_many(
-                    es,
-                    records,
-                    index=coll_name,        # mỗi collection map sang 1 index cùng tên
-                    collection=coll_name    # gắn tên collection để filter khi search
-                )
-                print(f"✅ Synced {count} docs from Firestore collection '{coll_name}' → ES index '{coll_name}'")
-            else:
-                print(f"⚠️ No documents found in collection '{coll_name}'")
 
-    except Exception as e:
-        print(f"❌ Error syncing Firestore → ES: {e}")
-    finally:
-        es.close()
+# /metrics: latency theo route (HTTP) + metrics ES / Firestore / auth / GraphQL / sync (services/metrics_svc.py)
+Instrumentator(excluded_handlers=["/metrics"]).instrument(app).expose(app, include_in_schema=False)
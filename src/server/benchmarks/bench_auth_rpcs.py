@@ -0,0 +1,115 @@
+"""
+Đếm số RPC Firestore cho mỗi lời gọi auth: cách cũ (read-then-write, set rồi get lại)
+so với cách mới (create-if-absent, merge trả về ngay).
+
+Chạy từ thư mục src/server với Firestore emulator:
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.bench_auth_rpcs --users 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import Counter
+
+import firebase_admin
+import google.auth.credentials
+from firebase_admin import credentials, firestore_async
+from google.cloud.firestore_v1.async_batch import AsyncWriteBatch
+from google.cloud.firestore_v1.async_document import AsyncDocumentReference
+
+from services import auth_svc
+from services.firestore_svc import _stamp
+
+rpc_counter: Counter = Counter()
+
+
+class _AnonymousCredential(credentials.Base):
+    """Emulator không cần credential thật."""
+
+    def get_credential(self):
+        return google.auth.credentials.AnonymousCredentials()
+
+
+def _count_rpcs() -> None:
+    def wrap(cls, name):
+        original = getattr(cls, name)
+
+        async def counted(self, *args, **kwargs):
+            rpc_counter[name] += 1
+            return await original(self, *args, **kwargs)
+
+        setattr(cls, name, counted)
+
+    for name in ("get", "set", "create", "update", "delete"):
+        wrap(AsyncDocumentReference, name)
+    wrap(AsyncWriteBatch, "commit")
+
+
+# ---- Cách cũ (trước khi đổi sang create-if-absent / merge không đọc lại) ----
+
+async def _legacy_ensure_user(uid: str, user_doc: dict) -> None:
+    ref = firestore_async.client().collection("users").document(uid)
+    if (await ref.get()).exists:
+        return
+    await ref.set(_stamp(user_doc))
+
+
+async def _legacy_update_profile(uid: str, fields: dict) -> dict:
+    ref = firestore_async.client().collection("users").document(uid)
+    await ref.set(_stamp(fields), merge=True)
+    return (await ref.get()).to_dict()
+
+
+async def _measure(label: str, fn, uids) -> dict:
+    rpc_counter.clear()
+    started = time.perf_counter()
+    for uid in uids:
+        await fn(uid)
+    elapsed = time.perf_counter() - started
+    calls = len(uids)
+    return {
+        "case": label,
+        "calls": calls,
+        "rpcs_per_call": round(sum(rpc_counter.values()) / calls, 2),
+        "rpcs": dict(rpc_counter),
+        "ms_per_call": round(elapsed / calls * 1000, 3),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        raise SystemExit("Set FIRESTORE_EMULATOR_HOST to run against the Firestore emulator")
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(
+            _AnonymousCredential(), {"projectId": os.getenv("GOOGLE_CLOUD_PROJECT", "demo-scholarlens")}
+        )
+    _count_rpcs()
+
+    doc = {"email": "bench@example.com", "display_name": "Bench", "provider": "password"}
+    fields = {"field_of_study": "Computer Science"}
+
+    def new_uids():
+        return [f"bench-{uuid.uuid4().hex}" for _ in range(args.users)]
+
+    legacy_new, current_new = new_uids(), new_uids()
+    results = [
+        await _measure("legacy_ensure_user:new", lambda u: _legacy_ensure_user(u, doc), legacy_new),
+        await _measure("legacy_ensure_user:existing", lambda u: _legacy_ensure_user(u, doc), legacy_new),
+        await _measure("ensure_user:new", lambda u: auth_svc._ensure_user_in_firestore(u, doc), current_new),
+        await _measure("ensure_user:existing", lambda u: auth_svc._ensure_user_in_firestore(u, doc), current_new),
+        await _measure("legacy_update_profile", lambda u: _legacy_update_profile(u, fields), legacy_new),
+        await _measure("update_profile", lambda u: auth_svc.update_profile(u, fields), current_new),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
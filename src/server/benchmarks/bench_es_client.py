@@ -0,0 +1,88 @@
+"""
+So sánh requests/sec: tạo Elasticsearch client mới mỗi request (cách cũ)
+với 1 client dùng chung (connection pool).
+
+Chạy từ thư mục src/server, cần ES đang chạy (ELASTICSEARCH_HOST, ELASTIC_USER, ELASTIC_PASSWORD):
+
+    python -m benchmarks.bench_es_client --requests 500 --concurrency 16 --index scholar_lens
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from elasticsearch import AsyncElasticsearch
+
+from services.es_client import ES_HOST, ES_USER, ES_PASS, create_es_client
+
+
+def _per_request_client() -> AsyncElasticsearch:
+    # Cấu hình giống _es_client() cũ trong gql/*_resolver.py
+    return AsyncElasticsearch(
+        hosts=[ES_HOST],
+        basic_auth=(ES_USER, ES_PASS),
+        verify_certs=False,
+        max_retries=30,
+        retry_on_timeout=True,
+        request_timeout=30,
+    )
+
+
+async def _run(call, requests: int, concurrency: int) -> dict:
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--index", default="scholar_lens")
+    args = parser.parse_args()
+
+    query = {"match_all": {}}
+
+    async def before():
+        es = _per_request_client()
+        try:
+            await es.search(index=args.index, query=query, size=10)
+        finally:
+            await es.close()
+
+    shared = create_es_client()
+
+    async def after():
+        await shared.search(index=args.index, query=query, size=10)
+
+    try:
+        await after()  # warm-up pool
+        result = {
+            "per_request_client": await _run(before, args.requests, args.concurrency),
+            "shared_client": await _run(after, args.requests, args.concurrency),
+        }
+    finally:
+        await shared.close()
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
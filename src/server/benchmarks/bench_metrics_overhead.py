@@ -0,0 +1,92 @@
+"""
+Đo overhead của instrumentation (decorator es_timed / firestore_timed, context manager track,
+extension GraphQL, TraceMiddleware khi request không được trace) so với gọi trực tiếp. Không cần ES / Firestore.
+
+    python -m benchmarks.bench_metrics_overhead --calls 200000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import strawberry
+
+from gql.extensions import OperationMetrics
+from services.metrics_svc import ES_CALL_ERRORS, ES_CALL_SECONDS, es_timed, track
+from services.trace_svc import TraceMiddleware
+
+
+async def _noop():
+    return None
+
+
+_timed_noop = es_timed("bench_noop")(_noop)
+
+
+async def _tracked_noop():
+    with track(ES_CALL_SECONDS, ES_CALL_ERRORS, "bench_noop", "es.bench_noop"):
+        return None
+
+
+async def _asgi_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+_traced_asgi_app = TraceMiddleware(_asgi_app)
+_HTTP_SCOPE = {"type": "http", "method": "GET", "path": "/ping", "headers": []}
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    return None
+
+
+@strawberry.type
+class _Query:
+    @strawberry.field
+    async def ping(self) -> str:
+        return "pong"
+
+
+async def _per_call_us(fn, calls: int) -> float:
+    for _ in range(max(1, calls // 10)):  # warm-up
+        await fn()
+    started = time.perf_counter()
+    for _ in range(calls):
+        await fn()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--graphql-calls", type=int, default=5_000)
+    args = parser.parse_args()
+
+    base = await _per_call_us(_noop, args.calls)
+    timed = await _per_call_us(_timed_noop, args.calls)
+    tracked = await _per_call_us(_tracked_noop, args.calls)
+    asgi = await _per_call_us(lambda: _asgi_app(_HTTP_SCOPE, _receive, _send), args.calls)
+    asgi_traced = await _per_call_us(lambda: _traced_asgi_app(_HTTP_SCOPE, _receive, _send), args.calls)
+
+    plain_schema = strawberry.Schema(query=_Query)
+    metered_schema = strawberry.Schema(query=_Query, extensions=[OperationMetrics])
+    gql_plain = await _per_call_us(lambda: plain_schema.execute("query Ping { ping }"), args.graphql_calls)
+    gql_metered = await _per_call_us(lambda: metered_schema.execute("query Ping { ping }"), args.graphql_calls)
+
+    print(json.dumps({
+        "coroutine_call_us": round(base, 3),
+        "es_timed_overhead_us": round(timed - base, 3),
+        "track_overhead_us": round(tracked - base, 3),
+        "trace_middleware_overhead_us": round(asgi_traced - asgi, 3),
+        "graphql_operation_us": round(gql_plain, 2),
+        "graphql_metrics_overhead_us": round(gql_metered - gql_plain, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,258 @@
+"""
+Elasticsearch giả chạy trong process (aiohttp) cho benchmark không cần container ES.
+
+Chỉ cài các endpoint mà services/es_svc.py dùng: index / mapping / settings / alias, _bulk, _search
+(cả PIT + search_after), _mget, _count. Không chấm điểm relevance: search trả `size` doc
+đầu tiên (sau `from` / `search_after`) với `_source` đã lọc theo includes / excludes và
+`matched_queries` = mọi `_name` trong query. Vì vậy số đo phản ánh chi phí phía app
+(dựng query, HTTP, (de)serialize JSON, map kết quả) — muốn đo cả ES thì chạy với ES thật.
+"""
+import fnmatch
+import json
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+_HEADERS = {"X-Elastic-Product": "Elasticsearch", "Content-Type": "application/json"}
+
+
+def _json(data: Any, status: int = 200) -> web.Response:
+    return web.Response(text=json.dumps(data), status=status, headers=_HEADERS)
+
+
+def _not_found(index: str) -> web.Response:
+    return _json(
+        {"error": {"type": "index_not_found_exception", "reason": f"no such index [{index}]"}, "status": 404}, 404
+    )
+
+
+def _query_names(node: Any) -> List[str]:
+    names: List[str] = []
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "_name" and isinstance(value, str):
+                names.append(value)
+            else:
+                names.extend(_query_names(value))
+    elif isinstance(node, list):
+        for value in node:
+            names.extend(_query_names(value))
+    return names
+
+
+def _project(src: Dict[str, Any], body: Dict[str, Any], params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    if body.get("_source") is False or params.get("_source") == "false":
+        return None
+    includes = params.get("_source_includes")
+    excludes = params.get("_source_excludes")
+    out = {k: v for k, v in src.items() if not includes or k in includes.split(",")}
+    for key in (excludes.split(",") if excludes else []):
+        out.pop(key, None)
+    return out
+
+
+class FakeElasticsearch:
+    def __init__(self):
+        self.indices: Dict[str, Dict[str, Any]] = {}  # index → {"mappings": ..., "docs": {id: source}}
+        self.aliases: Dict[str, str] = {}  # alias → index (mỗi alias 1 index là đủ cho benchmark)
+        self._pits: Dict[str, str] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.requests = 0
+
+    # ---- lifecycle ----
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self._app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound = self._runner.addresses[0][1]
+        return f"http://{host}:{bound}"
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    def _app(self) -> web.Application:
+        app = web.Application(client_max_size=200 * 1024 * 1024, middlewares=[self._count])
+        r = app.router
+        r.add_get("/", self.info)
+        r.add_get("/_alias", self.get_alias)
+        r.add_get("/_mapping", self.get_mapping)
+        r.add_get("/{index}/_settings", self.get_settings)
+        r.add_post("/_bulk", self.bulk)
+        r.add_put("/_bulk", self.bulk)
+        r.add_post("/_search", self.pit_search)
+        r.add_delete("/_pit", self.close_pit)
+        r.add_post("/_mget", self.mget)
+        r.add_route("HEAD", "/{index}", self.exists)
+        r.add_put("/{index}", self.create)
+        r.add_delete("/{index}", self.delete)
+        r.add_get("/{index}/_alias", self.get_alias)
+        r.add_get("/{index}/_mapping", self.get_mapping)
+        r.add_post("/{index}/_bulk", self.bulk)
+        r.add_post("/{index}/_search", self.search)
+        r.add_post("/{index}/_pit", self.open_pit)
+        r.add_post("/{index}/_mget", self.mget)
+        r.add_post("/{index}/_refresh", self.refresh)
+        r.add_route("*", "/{index}/_count", self.count)
+        return app
+
+    @web.middleware
+    async def _count(self, request: web.Request, handler):
+        self.requests += 1
+        return await handler(request)
+
+    def _resolve(self, name: Optional[str]) -> Optional[str]:
+        return self.aliases.get(name, name)
+
+    def _index(self, name: str) -> Dict[str, Any]:
+        return self.indices.setdefault(self._resolve(name), {"mappings": {}, "docs": {}})
+
+    # ---- handlers ----
+
+    async def info(self, request: web.Request) -> web.Response:
+        return _json({"name": "fake", "cluster_name": "benchmark", "version": {"number": "9.1.0"}, "tagline": "You Know, for Search"})
+
+    async def exists(self, request: web.Request) -> web.Response:
+        return web.Response(status=200 if self._resolve(request.match_info["index"]) in self.indices else 404, headers=_HEADERS)
+
+    async def create(self, request: web.Request) -> web.Response:
+        body = await request.json() if request.can_read_body else {}
+        self._index(request.match_info["index"])["mappings"] = body.get("mappings", {})
+        for alias in body.get("aliases", {}):
+            self.aliases[alias] = request.match_info["index"]
+        return _json({"acknowledged": True, "index": request.match_info["index"]})
+
+    async def delete(self, request: web.Request) -> web.Response:
+        for name in request.match_info["index"].split(","):
+            self.indices.pop(name, None)
+            self.aliases = {a: i for a, i in self.aliases.items() if i != name}
+        return _json({"acknowledged": True})
+
+    async def get_alias(self, request: web.Request) -> web.Response:
+        name = request.match_info.get("index")
+        names = [self._resolve(name)] if name and name != "*" else list(self.indices)
+        return _json({n: {"aliases": {a: {} for a, i in self.aliases.items() if i == n}} for n in names if n in self.indices})
+
+    async def get_settings(self, request: web.Request) -> web.Response:
+        pattern = request.match_info["index"]
+        names = [n for n in self.indices if fnmatch.fnmatchcase(n, pattern)]
+        return _json({n: {"settings": {"index": {"number_of_replicas": "0"}}} for n in names})
+
+    async def get_mapping(self, request: web.Request) -> web.Response:
+        name = self._resolve(request.match_info.get("index"))
+        names = [name] if name and name != "*" else list(self.indices)
+        if name and name != "*" and name not in self.indices:
+            return _not_found(name)
+        return _json({n: {"mappings": self.indices[n]["mappings"]} for n in names})
+
+    async def refresh(self, request: web.Request) -> web.Response:
+        return _json({"_shards": {"total": 1, "successful": 1, "failed": 0}})
+
+    async def count(self, request: web.Request) -> web.Response:
+        name = self._resolve(request.match_info["index"])
+        if name not in self.indices:
+            return _not_found(name)
+        return _json({"count": len(self.indices[name]["docs"])})
+
+    async def bulk(self, request: web.Request) -> web.Response:
+        lines = (await request.text()).splitlines()
+        default_index = request.match_info.get("index")
+        require_alias = request.query.get("require_alias") == "true"
+        items = []
+        i = 0
+        while i < len(lines):
+            if not lines[i].strip():
+                i += 1
+                continue
+            action = json.loads(lines[i])
+            op, meta = next(iter(action.items()))
+            name = meta.get("_index", default_index)
+            if op != "delete" and require_alias and name not in self.aliases:
+                error = {"type": "index_not_found_exception", "reason": f"[{name}] is not an alias"}
+                items.append({op: {"_id": meta["_id"], "status": 404, "error": error}})
+                i += 2
+                continue
+            docs = self._index(name)["docs"]
+            if op == "delete":
+                found = docs.pop(meta["_id"], None) is not None
+                items.append({op: {"_id": meta["_id"], "status": 200 if found else 404, "result": "deleted" if found else "not_found"}})
+                i += 1
+                continue
+            created = meta["_id"] not in docs
+            docs[meta["_id"]] = json.loads(lines[i + 1])
+            items.append({op: {"_id": meta["_id"], "status": 201 if created else 200, "result": "created" if created else "updated"}})
+            i += 2
+        return _json({"took": 1, "errors": any("error" in next(iter(it.values())) for it in items), "items": items})
+
+    def _hits(self, docs: Dict[str, Any], body: Dict[str, Any], params: Dict[str, str], start: int) -> List[Dict[str, Any]]:
+        size = int(body.get("size", params.get("size", 10)))
+        names = _query_names(body.get("query", {}))
+        hits = []
+        for n, (doc_id, src) in enumerate(list(docs.items())[start:start + size]):
+            hit = {"_index": src.get("collection", ""), "_id": doc_id, "_score": 1.0}
+            projected = _project(src, body, params)
+            if projected is not None:
+                hit["_source"] = projected
+            if names:
+                hit["matched_queries"] = names
+            if "sort" in body:
+                hit["sort"] = [1.0, start + n]
+            hits.append(hit)
+        return hits
+
+    async def search(self, request: web.Request) -> web.Response:
+        name = self._resolve(request.match_info["index"])
+        if name not in self.indices:
+            return _not_found(name)
+        body = await request.json() if request.can_read_body else {}
+        docs = self.indices[name]["docs"]
+        start = int(body.get("from", request.query.get("from", 0)))
+        hits = self._hits(docs, body, dict(request.query), start)
+        return _json({
+            "took": 1,
+            "hits": {"total": {"value": len(docs), "relation": "eq"}, "max_score": 1.0 if hits else None, "hits": hits},
+        })
+
+    async def open_pit(self, request: web.Request) -> web.Response:
+        name = self._resolve(request.match_info["index"])
+        if name not in self.indices:
+            return _not_found(name)
+        pit_id = f"pit-{len(self._pits)}"
+        self._pits[pit_id] = name
+        return _json({"id": pit_id})
+
+    async def close_pit(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return _json({"succeeded": self._pits.pop(body.get("id"), None) is not None, "num_freed": 1})
+
+    async def pit_search(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        name = self._pits.get(body.get("pit", {}).get("id"))
+        if name is None or name not in self.indices:
+            return _json({"error": {"type": "search_context_missing_exception"}, "status": 404}, 404)
+        docs = self.indices[name]["docs"]
+        start = body["search_after"][-1] + 1 if body.get("search_after") else int(body.get("from", 0))
+        hits = self._hits(docs, body, dict(request.query), start)
+        return _json({
+            "took": 1,
+            "pit_id": body["pit"]["id"],
+            "hits": {"total": {"value": len(docs), "relation": "eq"}, "max_score": 1.0 if hits else None, "hits": hits},
+        })
+
+    async def mget(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        default_index = request.match_info.get("index")
+        refs = body.get("docs") or [{"_index": default_index, "_id": doc_id} for doc_id in body.get("ids", [])]
+        out = []
+        for ref in refs:
+            index = ref.get("_index", default_index)
+            src = self.indices.get(self._resolve(index), {"docs": {}})["docs"].get(ref["_id"])
+            doc = {"_index": index, "_id": ref["_id"], "found": src is not None}
+            if src is not None:
+                projected = _project(src, body, dict(request.query))
+                if projected is not None:
+                    doc["_source"] = projected
+            out.append(doc)
+        return _json({"docs": out})
@@ -0,0 +1,100 @@
+"""
+Load test GraphQL: tăng dần concurrency và đo throughput + p50/p95 ở mỗi mức.
+So sánh 2 build (sync vs async) bằng cách chạy script với cùng tham số lên từng server
+và xem mức concurrency cao nhất mà p95 vẫn dưới ngưỡng (--p95-budget-ms).
+
+    python -m benchmarks.load_test --url http://localhost:8000/graphql \
+        --levels 8,16,32,64,128 --requests 400 --p95-budget-ms 200
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+
+SEARCH_QUERY = """
+query ($q: String) {
+  searchEs(collection: "scholar_lens", q: $q, size: 10) {
+    total
+    items { id score source { name closeTime } }
+  }
+}
+"""
+
+MATCH_QUERY = """
+query {
+  matchScholarships(profile: {fieldOfStudy: "Computer Science"}, size: 10) {
+    total
+    items { id esScore summaryName }
+  }
+}
+"""
+
+
+async def _level(session: aiohttp.ClientSession, url: str, payload: dict, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                async with session.post(url, json=payload) as resp:
+                    body = await resp.json()
+                    if resp.status != 200 or body.get("errors"):
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000/graphql")
+    parser.add_argument("--query", choices=["search", "match"], default="search")
+    parser.add_argument("--q", default="scholarship")
+    parser.add_argument("--levels", default="8,16,32,64,128")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--p95-budget-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    if args.query == "search":
+        payload = {"query": SEARCH_QUERY, "variables": {"q": args.q}}
+    else:
+        payload = {"query": MATCH_QUERY}
+
+    levels = [int(x) for x in args.levels.split(",")]
+    connector = aiohttp.TCPConnector(limit=max(levels))
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await _level(session, args.url, payload, 20, 4)  # warm-up
+        results = [await _level(session, args.url, payload, args.requests, c) for c in levels]
+
+    within_budget = [r["concurrency"] for r in results if r["p95_ms"] <= args.p95_budget_ms and not r["errors"]]
+    print(json.dumps({
+        "url": args.url,
+        "query": args.query,
+        "p95_budget_ms": args.p95_budget_ms,
+        "max_concurrency_within_budget": max(within_budget) if within_budget else None,
+        "levels": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
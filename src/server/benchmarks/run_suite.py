@@ -0,0 +1,312 @@
+"""
+Bộ benchmark tái lập được trên corpus học bổng giả (benchmarks/corpus.py), kết quả ghi ra JSON
+để so sánh giữa các lần chạy.
+
+Các case:
+- prepare_source / prepare_source_legacy: chi phí dựng `_source` (bản legacy gồm cả `_catch_all`), µs/doc
+- index_many: throughput bulk index toàn bộ corpus, docs/s
+- search_es:{empty,keyword,filter,combined} và match_scholarships: latency resolver (query cache tắt)
+- firestore_sync: seed Firestore emulator rồi full sync → ES (chỉ chạy khi có FIRESTORE_EMULATOR_HOST)
+
+Mặc định dùng ES giả trong process (benchmarks/fake_es.py — đo chi phí phía app, không có relevance).
+Muốn đo cả ES thì trỏ tới 1 container ES riêng. Suite chỉ ghi vào alias `bench_scholar_lens`
+(xoá lúc bắt đầu và lúc kết thúc); alias đó đã có doc từ trước thì dừng, trừ khi có --force:
+
+    docker run -d -p 9200:9200 -e discovery.type=single-node -e xpack.security.enabled=false elasticsearch:9.1.4
+    gcloud emulators firestore start --host-port=localhost:8080
+
+Chạy từ thư mục src/server:
+
+    python -m benchmarks.run_suite --docs 10000 --out bench-results/base.json
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.run_suite --docs 100000 \
+        --es-url http://localhost:9200 --out bench-results/es.json --compare bench-results/base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+from elasticsearch import AsyncElasticsearch
+
+from benchmarks.corpus import generate_docs
+from benchmarks.fake_es import FakeElasticsearch
+from gql.loaders import create_loaders
+from gql.match_resolver import match_scholarships
+from gql.search_resolver import search_es
+from gql.types import ScholarshipFilter, UserProfileInput
+from services import es_svc
+from services.cache_svc import query_cache
+
+# Không dùng tên index thật (ES_SEARCH_INDEX) → trỏ nhầm cluster cũng không xoá dữ liệu production
+INDEX = "bench_scholar_lens"
+FIRESTORE_COLLECTION = "bench_scholar_lens_sync"
+
+# Metric chính của từng loại case, dùng khi --compare (True = lớn hơn là tốt hơn)
+_KEY_METRICS = {"us_per_doc": False, "docs_per_sec": True, "p50_ms": False, "p95_ms": False}
+
+
+def _git_sha() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+# ======================
+# Cases
+# ======================
+
+def bench_prepare_source(docs: List[Dict[str, Any]], *, legacy: bool, repeat: int = 5) -> Dict[str, Any]:
+    # Lấy lần nhanh nhất trong `repeat` lần để bớt nhiễu của máy
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            es_svc._prepare_source(doc, INDEX, legacy=legacy)
+        best = min(best, time.perf_counter() - started)
+    return {"docs": len(docs), "repeat": repeat, "us_per_doc": round(best / len(docs) * 1e6, 3)}
+
+
+async def bench_index_many(client: AsyncElasticsearch, n: int, seed: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    success, errors = await es_svc.index_many(client, generate_docs(n, seed), index=INDEX, collection=INDEX)
+    elapsed = time.perf_counter() - started
+    await client.indices.refresh(index=INDEX)
+    return {
+        "docs": n,
+        "indexed": success,
+        "failed": len(errors),
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(success / elapsed, 1),
+    }
+
+
+async def bench_latency(call: Callable[[], Awaitable[Any]], iterations: int) -> Dict[str, Any]:
+    for _ in range(min(10, iterations)):  # warm-up: pool, JIT của regex / json
+        await call()
+    latencies = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(_percentile(latencies, 0.5), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+
+def _search_cases(client: AsyncElasticsearch) -> Dict[str, Callable[[], Awaitable[Any]]]:
+    filt = ScholarshipFilter(field_of_study="Computer Science", min_amount="5,000 USD")
+    profile = UserProfileInput(
+        name="Excellence",
+        university=["University of Tokyo", "KAIST"],
+        field_of_study="Computer Science",
+        min_amount="1000 USD",
+    )
+
+    def search(**kwargs):
+        return lambda: search_es(client, create_loaders(client), collection=INDEX, size=10, **kwargs)
+
+    return {
+        "search_es:empty": search(),
+        "search_es:keyword": search(q="data science fellowship"),
+        "search_es:filter": search(filter=filt),
+        "search_es:combined": search(q="research scholarship", filter=filt, sort_by_deadline=True),
+        "match_scholarships": lambda: match_scholarships(
+            client, create_loaders(client), profile=profile, size=10, collection=INDEX
+        ),
+    }
+
+
+async def _clear_firestore_emulator() -> None:
+    project = os.getenv("GOOGLE_CLOUD_PROJECT", "demo-scholarlens")
+    url = f"http://{os.environ['FIRESTORE_EMULATOR_HOST']}/emulator/v1/projects/{project}/databases/(default)/documents"
+    async with aiohttp.ClientSession() as session:
+        async with session.delete(url) as resp:
+            resp.raise_for_status()
+
+
+async def bench_firestore_sync(client: AsyncElasticsearch, n: int, seed: int) -> Dict[str, Any]:
+    import firebase_admin
+    from firebase_admin import firestore_async
+
+    from benchmarks.bench_auth_rpcs import _AnonymousCredential
+    from services.firestore_svc import save_many_raw
+    from services.sync_svc import sync_collection
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(
+            _AnonymousCredential(), {"projectId": os.getenv("GOOGLE_CLOUD_PROJECT", "demo-scholarlens")}
+        )
+    await _clear_firestore_emulator()
+
+    started = time.perf_counter()
+    await save_many_raw(FIRESTORE_COLLECTION, generate_docs(n, seed))
+    seed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    summary = await sync_collection(client, firestore_async.client().collection(FIRESTORE_COLLECTION), full=True)
+    elapsed = time.perf_counter() - started
+    return {
+        "docs": n,
+        "indexed": summary["indexed"],
+        "failed": summary["failed"],
+        "chunks": len(summary["chunks"]),
+        "firestore_seed_seconds": round(seed_seconds, 3),
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(summary["indexed"] / elapsed, 1) if elapsed else None,
+    }
+
+
+# ======================
+# Compare
+# ======================
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression_pct: float) -> List[Dict[str, Any]]:
+    """So metric chính từng case với baseline; `regression` = tệ hơn quá max_regression_pct %."""
+    rows = []
+    for case, result in current["results"].items():
+        base = baseline.get("results", {}).get(case)
+        if not base:
+            continue
+        for metric, higher_is_better in _KEY_METRICS.items():
+            if metric not in result or not base.get(metric):
+                continue
+            change = (result[metric] - base[metric]) / base[metric] * 100
+            worse = -change if higher_is_better else change
+            rows.append({
+                "case": case,
+                "metric": metric,
+                "baseline": base[metric],
+                "current": result[metric],
+                "change_pct": round(change, 1),
+                "regression": worse > max_regression_pct,
+            })
+    return rows
+
+
+# ======================
+# Main
+# ======================
+
+async def _drop_index(client: AsyncElasticsearch) -> None:
+    if await client.indices.exists(index=INDEX):
+        # INDEX là alias → xoá các index `bench_scholar_lens_v{N}` phía sau
+        await client.indices.delete(index=list(await client.indices.get_alias(index=INDEX)))
+    es_svc.forget_index(INDEX)
+
+
+async def run(args) -> Dict[str, Any]:
+    fake = None
+    if args.es_url:
+        client = AsyncElasticsearch(
+            hosts=[args.es_url],
+            basic_auth=(args.es_user, args.es_password) if args.es_user else None,
+            verify_certs=False,
+            request_timeout=120,
+        )
+        target = args.es_url
+    else:
+        fake = FakeElasticsearch()
+        client = AsyncElasticsearch(hosts=[await fake.start()], request_timeout=120)
+        target = "in-process-fake"
+
+    query_cache.enabled = False  # đo resolver + ES, không đo cache
+    results: Dict[str, Any] = {}
+    try:
+        if await client.indices.exists(index=INDEX):
+            docs = (await client.count(index=INDEX))["count"]
+            if docs and not args.force:
+                raise SystemExit(f"❌ '{INDEX}' on {target} already has {docs} docs; rerun with --force to delete it")
+        await _drop_index(client)
+
+        sample = list(generate_docs(min(args.docs, 20000), args.seed))
+        results["prepare_source"] = bench_prepare_source(sample, legacy=False)
+        results["prepare_source_legacy"] = bench_prepare_source(sample, legacy=True)
+        print(f"… prepare_source: {results['prepare_source']['us_per_doc']} µs/doc")
+
+        results["index_many"] = await bench_index_many(client, args.docs, args.seed)
+        print(f"… index_many: {results['index_many']['docs_per_sec']} docs/s")
+
+        for case, call in _search_cases(client).items():
+            results[case] = await bench_latency(call, args.iterations)
+            print(f"… {case}: p50 {results[case]['p50_ms']} ms")
+
+        if os.getenv("FIRESTORE_EMULATOR_HOST"):
+            results["firestore_sync"] = await bench_firestore_sync(client, args.firestore_docs, args.seed)
+            print(f"… firestore_sync: {results['firestore_sync']['docs_per_sec']} docs/s")
+        else:
+            print("… firestore_sync: skipped (FIRESTORE_EMULATOR_HOST not set)")
+        await _drop_index(client)
+    finally:
+        await client.close()
+        if fake:
+            await fake.stop()
+
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_sha": _git_sha(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": target,
+            "docs": args.docs,
+            "seed": args.seed,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=10000, help="số doc corpus (10k – 1M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=200, help="số lần gọi mỗi case search")
+    parser.add_argument("--firestore-docs", type=int, default=5000)
+    parser.add_argument("--es-url", help="ES riêng cho benchmark; bỏ trống = ES giả trong process")
+    parser.add_argument("--es-user")
+    parser.add_argument("--es-password")
+    parser.add_argument("--force", action="store_true", help=f"xoá '{INDEX}' kể cả khi đã có doc")
+    parser.add_argument("--out", help="ghi kết quả JSON ra file")
+    parser.add_argument("--compare", help="file JSON của lần chạy trước để so sánh")
+    parser.add_argument("--max-regression-pct", type=float, default=15.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f), args.max_regression_pct)
+
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+        print(f"✅ Wrote results to {args.out}")
+    else:
+        print(out)
+
+    if any(row["regression"] for row in report.get("comparison", [])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
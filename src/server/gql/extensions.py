@@ -0,0 +1,84 @@
+import time
+from typing import Optional
+
+from graphql import DocumentNode, FieldNode, GraphQLSchema, get_operation_ast
+from strawberry.extensions import SchemaExtension
+from strawberry.fastapi import GraphQLRouter
+
+from services.metrics_svc import GRAPHQL_OPERATION_ERRORS, GRAPHQL_OPERATION_SECONDS
+from services.trace_svc import current_trace, span
+
+
+def _root_fields_label(schema: GraphQLSchema, document: Optional[DocumentNode], operation_name: Optional[str]) -> str:
+    """
+    Label của operation = tên root field (vd `searchEs`, `matchScholarships+searchEs`), không dùng
+    operationName do client tự đặt → số series bị chặn bởi số field của schema. Field không có
+    trong schema (document lỗi, introspection) gộp vào "other".
+    """
+    operation = get_operation_ast(document, operation_name) if document else None
+    root = getattr(schema, f"{operation.operation.value}_type") if operation else None
+    if root is None:
+        return "other"
+    names = set()
+    for selection in operation.selection_set.selections:
+        if not isinstance(selection, FieldNode) or selection.name.value not in root.fields:
+            return "other"
+        names.add(selection.name.value)
+    return "+".join(sorted(names)) or "other"
+
+
+class OperationMetrics(SchemaExtension):
+    """Ghi latency + lỗi theo từng GraphQL operation (root field, query/mutation)."""
+
+    def on_operation(self):
+        started = time.perf_counter()
+        yield
+        ctx = self.execution_context
+        name = _root_fields_label(ctx.schema._schema, ctx.graphql_document, ctx.operation_name)
+        try:
+            op_type = ctx.operation_type.value
+        except Exception:
+            op_type = "unknown"  # document không parse được
+        GRAPHQL_OPERATION_SECONDS.labels(name, op_type).observe(time.perf_counter() - started)
+        if ctx.pre_execution_errors or (ctx.result and ctx.result.errors):
+            GRAPHQL_OPERATION_ERRORS.labels(name, op_type).inc()
+
+
+class OperationTracing(SchemaExtension):
+    """
+    Span cho từng giai đoạn của operation (parse / validate / execute); resolver, ES, Firestore
+    tự mở span con. Request có debug timing → trả bảng thời gian trong `extensions.timing`.
+    """
+
+    def on_operation(self):
+        with span("graphql.operation") as s:
+            yield
+            if s is not None:
+                ctx = self.execution_context
+                s.set("graphql.operation.name", ctx.operation_name or "anonymous")
+
+    def on_parse(self):
+        with span("graphql.parse"):
+            yield
+
+    def on_validate(self):
+        with span("graphql.validate"):
+            yield
+
+    def on_execute(self):
+        with span("graphql.execute"):
+            yield
+
+    def get_results(self):
+        trace = current_trace()
+        if trace is None or not trace.debug:
+            return {}
+        return {"timing": {"traceId": trace.trace_id, "spans": trace.breakdown()}}
+
+
+class TracedGraphQLRouter(GraphQLRouter):
+    """GraphQLRouter + span cho bước encode JSON response (ngoài phạm vi schema extension)."""
+
+    def encode_json(self, data) -> str:
+        with span("graphql.serialize"):
+            return super().encode_json(data)
@@ -0,0 +1,23 @@
+from typing import Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from strawberry.dataloader import DataLoader
+
+from services.firestore_svc import BATCH_GET_MAX_IDS
+
+from .types import FirestoreDocument, FirestoreDocumentBatch
+
+
+async def get_documents(loaders: Dict[str, DataLoader], *, collection: str, ids: List[str]) -> FirestoreDocumentBatch:
+    if len(ids) > BATCH_GET_MAX_IDS:
+        raise ValueError(f"At most {BATCH_GET_MAX_IDS} ids per request")
+    docs = await loaders["firestore_doc"].load_many([(collection, doc_id) for doc_id in ids])
+    return FirestoreDocumentBatch(
+        # Timestamp Firestore → ISO string để JSON scalar serialize được
+        items=[
+            FirestoreDocument(id=doc_id, data=jsonable_encoder(doc))
+            for doc_id, doc in zip(ids, docs)
+            if doc is not None
+        ],
+        missing=[doc_id for doc_id, doc in zip(ids, docs) if doc is None],
+    )
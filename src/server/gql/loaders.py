@@ -0,0 +1,71 @@
+"""
+DataLoader theo từng request GraphQL: gom + dedupe các lần load document theo id
+của mọi resolver trong cùng 1 operation thành 1 lần gọi backend.
+Tạo mới trong context_getter cho mỗi request → cache không rò rỉ giữa các request/user.
+"""
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from elasticsearch import AsyncElasticsearch
+from strawberry.dataloader import DataLoader
+
+from services.es_svc import SOURCE_EXCLUDES
+from services.firestore_svc import BATCH_GET_MAX_IDS, get_many_raw
+from services.metrics_svc import ES_CALL_SECONDS, ES_CALL_ERRORS, track
+
+# key = (index/collection, doc id)
+DocKey = Tuple[str, str]
+
+
+def _es_source_loader(es: AsyncElasticsearch) -> DataLoader:
+    async def load(keys: List[DocKey]) -> List[Optional[Dict[str, Any]]]:
+        # 1 mget cho mọi index trong batch
+        with track(ES_CALL_SECONDS, ES_CALL_ERRORS, "mget", "es.mget"):
+            res = await es.mget(
+                docs=[{"_index": index, "_id": doc_id} for index, doc_id in keys],
+                source_excludes=SOURCE_EXCLUDES,
+            )
+        # docs trả về đúng thứ tự yêu cầu (kể cả khi index là alias)
+        return [d.get("_source", {}) if d.get("found") else None for d in res.get("docs", [])]
+
+    return DataLoader(load_fn=load)
+
+
+def _firestore_doc_loader() -> DataLoader:
+    async def load(keys: List[DocKey]) -> List[Optional[Dict[str, Any]]]:
+        by_collection: Dict[str, List[str]] = defaultdict(list)
+        for collection, doc_id in keys:
+            by_collection[collection].append(doc_id)
+        found: Dict[DocKey, Optional[Dict[str, Any]]] = {}
+        for collection, ids in by_collection.items():
+            for doc_id, doc in zip(ids, await get_many_raw(collection, ids)):
+                found[(collection, doc_id)] = doc
+        return [found.get(key) for key in keys]
+
+    # Nhiều field `documents` (alias) trong 1 query gộp vào 1 batch → vẫn chia theo giới hạn get_all
+    return DataLoader(load_fn=load, max_batch_size=BATCH_GET_MAX_IDS)
+
+
+def create_loaders(es: AsyncElasticsearch) -> Dict[str, DataLoader]:
+    return {
+        "es_source": _es_source_loader(es),
+        "firestore_doc": _firestore_doc_loader(),
+    }
+
+
+def prime_hits(
+    loaders: Optional[Dict[str, DataLoader]],
+    index: str,
+    hits: List[Dict[str, Any]],
+    *,
+    partial: bool = False,
+) -> None:
+    """
+    Hit search đã có `_source` → nạp sẵn vào loader, resolver sau load theo id không cần mget.
+    Bỏ qua khi `_source` chỉ là 1 phần (đã lọc theo selection set) để loader không trả thiếu field.
+    """
+    if not loaders or partial:
+        return
+    loaders["es_source"].prime_many(
+        {(index, h["id"]): h["source"] for h in hits if h.get("id") and h.get("source")}
+    )
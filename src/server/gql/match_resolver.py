@@ -1,30 +1,34 @@
+import json
 import os
 from typing import List, Optional, Dict, Any
 
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch
+from strawberry.dataloader import DataLoader
 
-from services.es_svc import filter_advanced
+from services.es_svc import search_weighted, DATE_FORMAT
+from services.amount_svc import amount_range_filter
+from services.cache_svc import cached_query
+from services.es_client import ES_SEARCH_INDEX
+from services.trace_svc import span
+from .loaders import create_loaders, prime_hits
 from .types import (
     UserProfileInput,
     MatchItem,
     MatchResult,
 )
 
-
-ES_HOST = os.getenv("ELASTICSEARCH_HOST")
-ES_USER = os.getenv("ELASTIC_USER")
-ES_PASS = os.getenv("ELASTIC_PASSWORD")
-
-
-def _es_client() -> Elasticsearch:
-    return Elasticsearch(
-        hosts=[ES_HOST],
-        basic_auth=(ES_USER, ES_PASS),
-        verify_certs=False,
-        max_retries=30,
-        retry_on_timeout=True,
-        request_timeout=30,
-    )
+# Trọng số từng tiêu chí khi chấm điểm matchScholarships. Override bằng env MATCH_WEIGHTS='{"university": 3}'
+_DEFAULT_MATCH_WEIGHTS: Dict[str, float] = {
+    "field_of_study": 3.0,
+    "university": 2.0,
+    "name": 2.0,
+    "amount": 1.5,
+    "deadline": 1.0,
+    "deadline_soon": 1.0,  # hạn nộp càng gần (nhưng chưa qua) càng được cộng nhiều
+}
+MATCH_WEIGHTS: Dict[str, float] = {**_DEFAULT_MATCH_WEIGHTS, **{k: float(v) for k, v in json.loads(os.getenv("MATCH_WEIGHTS", "{}")).items()}}
+# Khoảng cách tới hạn nộp mà điểm thưởng giảm còn 1/2
+MATCH_DEADLINE_SCALE = os.getenv("MATCH_DEADLINE_SCALE", "30d")
 
 
 def _to_summary_fields(src: dict):
@@ -36,167 +40,151 @@ def _to_summary_fields(src: dict):
         "summary_url": src.get("url"),
     }
 
-def _build_matched_fields(profile: Optional[UserProfileInput], source: Dict[str, Any]) -> List[str]:
-    """
-    Build list of reasons why this scholarship matched the user profile.
-    Based on actual scholarship fields: name, university, open_time, close_time, amount, field_of_study, url
-    """
-    reasons: List[str] = []
-
-    if not profile:
-        return reasons
-
-    # Field of study match
-    if profile.field_of_study:
-        scholarship_fields = source.get("field_of_study", "")
-        if scholarship_fields and profile.field_of_study.lower() in scholarship_fields.lower():
-            reasons.append(f"field_of_study_match:{profile.field_of_study}")
-
-    # University match
-    if profile.university:
-        scholarship_uni = source.get("university", "")
-        if scholarship_uni:
-            for desired_uni in profile.university:
-                if desired_uni.lower() in scholarship_uni.lower():
-                    reasons.append(f"university_match:{desired_uni}")
-                    break
-
-    # Name/keyword match
-    if profile.name:
-        scholarship_name = source.get("name", "")
-        if profile.name.lower() in scholarship_name.lower():
-            reasons.append(f"name_keyword_match:{profile.name}")
-
-    # Amount match (if specified)
-    if profile.min_amount or profile.max_amount:
-        scholarship_amount = source.get("amount")
-        if scholarship_amount:
-            reasons.append(f"amount_specified:{scholarship_amount}")
-
-    return reasons
-
-
-def _profile_to_filters(profile: Optional[UserProfileInput]) -> List[Dict[str, Any]]:
+def _profile_to_criteria(profile: Optional[UserProfileInput]) -> List[Dict[str, Any]]:
     """
-    Convert user profile preferences to Elasticsearch filters.
+    Convert user profile preferences to weighted, named Elasticsearch criteria.
     Maps to actual scholarship fields: name, university, open_time, close_time, amount, field_of_study, url
+    Tên filter (`name`) chính là lý do trả về trong `matched_fields`.
     """
-    filters: List[Dict[str, Any]] = []
+    criteria: List[Dict[str, Any]] = []
     if not profile:
-        return filters
-    
+        return criteria
+
     # Name/keyword search
     if profile.name:
-        filters.append({"field": "name", "values": [profile.name], "operator": "OR"})
+        criteria.append({"weight": MATCH_WEIGHTS["name"], "filters": [
+            {"field": "name", "values": [profile.name], "operator": "OR", "name": f"name_keyword_match:{profile.name}"},
+        ]})
 
-    # University filter
+    # University: mỗi trường 1 named query, cả nhóm tính 1 lần trọng số
     if profile.university:
-        filters.append({"field": "university", "values": list(profile.university), "operator": "OR"})
+        criteria.append({"weight": MATCH_WEIGHTS["university"], "filters": [
+            {"field": "university", "values": [uni], "operator": "AND", "name": f"university_match:{uni}"}
+            for uni in profile.university
+        ]})
 
     # Field of Study
     if profile.field_of_study:
-        filters.append({"field": "field_of_study", "values": [profile.field_of_study], "operator": "OR"})
-
-    # Amount range filters (if your ES service supports range queries on amount)
-    # Note: This may require custom handling since amount can be strings like "450 USD" or "10,000,000 VNĐ"
-    if profile.min_amount:
-        filters.append({
-            "field": "amount",
-            "values": [profile.min_amount],
-            "operator": "OR",
-        })
-    
-    if profile.max_amount:
-        filters.append({
-            "field": "amount",
-            "values": [profile.max_amount],
-            "operator": "OR",
-        })
-
-    # Deadline range filters (close_time field)
-    # Using range mode if supported by your ES service
+        criteria.append({"weight": MATCH_WEIGHTS["field_of_study"], "filters": [
+            {"field": "field_of_study", "values": [profile.field_of_study], "operator": "OR",
+             "name": f"field_of_study_match:{profile.field_of_study}"},
+        ]})
+
+    # Amount range: range trên amount_value (số, đã quy về tiền chung lúc index)
+    amount_rng = amount_range_filter(profile.min_amount, profile.max_amount)
+    if amount_rng:
+        criteria.append({"weight": MATCH_WEIGHTS["amount"], "filters": [{**amount_rng, "name": "amount_in_range"}]})
+
+    # Deadline range filters: range trên close_time_date (kiểu date, chuẩn hoá lúc index)
     if profile.deadline_after or profile.deadline_before:
-        rng: Dict[str, Any] = {"field": "close_time", "mode": "range"}
+        rng: Dict[str, Any] = {"field": "close_time_date", "mode": "range", "format": DATE_FORMAT, "name": "deadline_in_range"}
         if profile.deadline_after:
             rng["min"] = profile.deadline_after
         if profile.deadline_before:
             rng["max"] = profile.deadline_before
-        filters.append(rng)
+        criteria.append({"weight": MATCH_WEIGHTS["deadline"], "filters": [rng]})
 
-    return filters
+    return criteria
 
 
-def _load_scholarships_by_ids(client: Elasticsearch, index: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
-    if not ids:
-        return {}
-    try:
-        res = client.mget(index=index, ids=ids)
-        out: Dict[str, Dict[str, Any]] = {}
-        for doc in res.get("docs", []):
-            if doc.get("found"):
-                out[str(doc.get("_id"))] = doc.get("_source", {})
-        return out
-    except Exception:
-        return {}
+# Field GraphQL của MatchItem → field `_source` cần lấy từ ES
+SOURCE_FIELD_MAP = {
+    "id": [],
+    "esScore": [],
+    "matchScore": [],
+    "matchedFields": [],
+    "summaryName": ["name"],
+    "summaryStartDate": ["open_time"],
+    "summaryEndDate": ["close_time"],
+    "summaryAmount": ["amount"],
+    "summaryUrl": ["url"],
+}
 
 
-def match_scholarships(
+@cached_query("match_scholarships")
+async def match_scholarships(
+    es: AsyncElasticsearch,
+    loaders: Optional[Dict[str, DataLoader]] = None,
     *,
     profile: Optional[UserProfileInput],
     size: int = 10,
     offset: int = 0,
+    source_fields: Optional[List[str]] = None,
+    after: Optional[str] = None,
+    use_cursor: bool = False,
+    include_expired: bool = False,
+    collection: str = ES_SEARCH_INDEX,
 ) -> MatchResult:
-    es = _es_client()
-    try:
-        collection = "scholar_lens"
-        filters = _profile_to_filters(profile)
-
-        # Use broad retrieval with OR to get diverse candidates
-        res = filter_advanced(
-            client=es,
-            index=collection,
-            collection=collection,
-            filters=filters,
-            inter_field_operator="OR",
-            size=size,
-            offset=offset,
-        ) if filters else {"total": 0, "items": []}
-
-        items: List[MatchItem] = []
-        warnings: List[str] = []
-        hits = res.get("items", [])
-        ids = [h.get("id", "") for h in hits]
-        sources_by_id = _load_scholarships_by_ids(es, collection, ids)
-        if hits and not sources_by_id:
-            warnings.append("Unable to batch load sources; using inline ES sources when available.")
-
+    with span("match.build_criteria"):
+        criteria = _profile_to_criteria(profile)
+
+    # 1 query: mỗi tiêu chí cộng đúng trọng số của nó + điểm thưởng hạn nộp sắp tới
+    res = await search_weighted(
+        es,
+        index=collection,
+        collection=collection,
+        criteria=criteria,
+        decay={
+            "field": "close_time_date",
+            "scale": MATCH_DEADLINE_SCALE,
+            "weight": MATCH_WEIGHTS["deadline_soon"],
+            "name": "deadline_upcoming",
+        },
+        size=size,
+        offset=offset,
+        source_includes=source_fields,
+        after=after,
+        use_cursor=use_cursor,
+        active_only=not include_expired,
+    ) if criteria else {"total": 0, "items": []}
+    max_score = res.get("max_score") or 1.0
+
+    items: List[MatchItem] = []
+    warnings: List[str] = []
+    hits = res.get("items", [])
+    # Hit đã mang _source → dùng luôn; chỉ load (batched qua DataLoader) những hit thiếu source
+    loaders = loaders or create_loaders(es)
+    prime_hits(loaders, collection, hits, partial=source_fields is not None)
+    missing = [h.get("id", "") for h in hits if not h.get("source")] if source_fields is None else []
+    sources_by_id: Dict[str, Dict[str, Any]] = {}
+    if missing:
+        try:
+            with span("match.load_sources", count=len(missing)):
+                loaded = await loaders["es_source"].load_many([(collection, sid) for sid in missing])
+            sources_by_id = {sid: src for sid, src in zip(missing, loaded) if src}
+        except Exception:
+            warnings.append("Unable to batch load sources; some items have no summary.")
+
+    with span("match.build_items", count=len(hits)):
         for h in hits:
             sid = h.get("id", "")
-            src = sources_by_id.get(sid) or h.get("source") or {}
-            matched_fields = _build_matched_fields(profile, src)
+            src = h.get("source") or sources_by_id.get(sid) or {}
+            es_score = float(h.get("score", 0.0) or 0.0)
             items.append(
                 MatchItem(
                     id=sid,
-                    es_score=float(h.get("score", 0.0) or 0.0),
-                    # ES handles ranking; keep match_score for backward compatibility
-                    match_score=0.0,
-                    matched_fields=matched_fields,
+                    es_score=es_score,
+                    # Tổng trọng số các tiêu chí khớp / tổng trọng số tối đa, trong [0, 1]
+                    match_score=round(min(es_score / max_score, 1.0), 4),
+                    matched_fields=h.get("matched", []),
                     **_to_summary_fields(src),
                 )
             )
 
-        # Preserve ES order; no Python-side re-ranking
-
-        total_hits = res.get("total", len(items))
-        has_next = (offset + size) < total_hits
-        next_off = (offset + size) if has_next else None
-
-        return MatchResult(
-            total=total_hits,
-            items=items,
-            hasNextPage=has_next,
-            nextOffset=next_off,
-            warnings=warnings or None,
-        )
-    finally:
-        es.close()
+    # Preserve ES order; no Python-side re-ranking
+
+    total_hits = res.get("total", len(items))
+    next_cursor = res.get("next_cursor")
+    has_next = next_cursor is not None if (after or use_cursor) else (offset + size) < total_hits
+    # Trang đầu (kể cả khi client chọn nextCursor) vẫn bắt đầu từ `offset` nên nextOffset vẫn đúng;
+    # trang đi theo `after` không biết vị trí tuyệt đối → chỉ trả cursor.
+    next_off = (offset + size) if has_next and not after else None
+
+    return MatchResult(
+        total=total_hits,
+        items=items,
+        hasNextPage=has_next,
+        nextOffset=next_off,
+        nextCursor=next_cursor,
+        warnings=warnings or None,
+    )
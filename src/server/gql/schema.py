@@ -1,16 +1,20 @@
 import strawberry
 from typing import Optional, List
 
-from .types import ScholarshipFilter, InterFieldOperator, SearchResult, UserProfileInput, MatchResult, SortOrder
-from .search_resolver import search_es as search_es_resolver
-from .match_resolver import match_scholarships as match_resolver
+from .types import ScholarshipFilter, InterFieldOperator, SearchResult, UserProfileInput, MatchResult, SortOrder, FirestoreDocumentBatch
+from .search_resolver import search_es as search_es_resolver, SOURCE_FIELD_MAP as SEARCH_SOURCE_FIELDS
+from .match_resolver import match_scholarships as match_resolver, SOURCE_FIELD_MAP as MATCH_SOURCE_FIELDS
+from .selection import requested_source_fields, is_selected
+from .firestore_resolver import get_documents as documents_resolver
+from .extensions import OperationMetrics, OperationTracing
 
 
 @strawberry.type
 class Query:
     @strawberry.field(description="Unified ES search combining keyword and structured filters")
-    def search_es(
+    async def search_es(
         self,
+        info: strawberry.Info,
         collection: str,
         q: Optional[str] = None,
         filter: Optional[ScholarshipFilter] = None,
@@ -19,8 +23,12 @@ class Query:
         sort_order: SortOrder = SortOrder.ASC,
         size: int = 10,
         offset: int = 0,
+        after: Optional[str] = None,
+        include_expired: bool = False,
     ) -> SearchResult:
-        return search_es_resolver(
+        return await search_es_resolver(
+            info.context["es"],
+            info.context["loaders"],
             collection=collection,
             q=q,
             filter=filter,
@@ -29,20 +37,43 @@ class Query:
             sort_order=sort_order,
             size=size,
             offset=offset,
+            source_fields=requested_source_fields(info, ("items", "source"), SEARCH_SOURCE_FIELDS),
+            after=after,
+            # Chọn nextCursor chỉ sinh cursor; point-in-time được mở khi client gửi `after`
+            use_cursor=is_selected(info, "nextCursor"),
+            include_expired=include_expired,
         )
 
     @strawberry.field(name="matchScholarships", description="Recommend scholarships for a given user profile")
-    def match_scholarships(
+    async def match_scholarships(
         self,
+        info: strawberry.Info,
         profile: Optional[UserProfileInput] = None,
         size: int = 10,
         offset: int = 0,
+        after: Optional[str] = None,
+        include_expired: bool = False,
     ) -> MatchResult:
-        return match_resolver(
+        return await match_resolver(
+            info.context["es"],
+            info.context["loaders"],
             profile=profile,
             size=size,
             offset=offset,
+            source_fields=requested_source_fields(info, ("items",), MATCH_SOURCE_FIELDS),
+            after=after,
+            use_cursor=is_selected(info, "nextCursor"),
+            include_expired=include_expired,
         )
 
+    @strawberry.field(description="Batch read Firestore documents by id (max 500 ids; input order kept, missing ids reported)")
+    async def documents(
+        self,
+        info: strawberry.Info,
+        collection: str,
+        ids: List[str],
+    ) -> FirestoreDocumentBatch:
+        return await documents_resolver(info.context["loaders"], collection=collection, ids=ids)
+
 
-schema = strawberry.Schema(query=Query)
+schema = strawberry.Schema(query=Query, extensions=[OperationMetrics, OperationTracing])
@@ -1,10 +1,12 @@
-import os
-from typing import List, Optional
-from datetime import date, timedelta
+from typing import Dict, List, Optional
 
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch
+from strawberry.dataloader import DataLoader
 
-from services.es_svc import search_keyword, filter_advanced
+from services.es_svc import search_keyword, filter_advanced, search_combined, DATE_FORMAT
+from services.amount_svc import amount_range_filter
+from services.cache_svc import cached_query
+from .loaders import prime_hits
 from .types import (
     ScholarshipFilter,
     InterFieldOperator,
@@ -15,23 +17,23 @@ from .types import (
 )
 
 
-ES_HOST = os.getenv("ELASTICSEARCH_HOST")
-ES_USER = os.getenv("ELASTIC_USER")
-ES_PASS = os.getenv("ELASTIC_PASSWORD")
+# Field GraphQL của ScholarshipSource → field `_source` cần lấy từ ES
+SOURCE_FIELD_MAP = {
+    "name": ["name"],
+    "university": ["university"],
+    "openTime": ["open_time"],
+    "closeTime": ["close_time"],
+    "amount": ["amount"],
+    "fieldOfStudy": ["field_of_study"],
+    "url": ["url"],
+    "daysUntilDeadline": ["close_time_date"],
+}
 
 
-def _es_client() -> Elasticsearch:
-    return Elasticsearch(
-        hosts=[ES_HOST],
-        basic_auth=(ES_USER, ES_PASS),
-        verify_certs=False,
-        max_retries=30,
-        retry_on_timeout=True,
-        request_timeout=30,
-    )
-
-
-def search_es(
+@cached_query("search_es")
+async def search_es(
+    es: AsyncElasticsearch,
+    loaders: Optional[Dict[str, DataLoader]] = None,
     *,
     collection: str,
     q: Optional[str] = None,
@@ -41,166 +43,126 @@ def search_es(
     sort_order: SortOrder = SortOrder.ASC,
     size: int = 10,
     offset: int = 0,
+    source_fields: Optional[List[str]] = None,
+    after: Optional[str] = None,
+    use_cursor: bool = False,
+    include_expired: bool = False,
 ) -> SearchResult:
-    es = _es_client()
-    try:
-        def _to_scholarship_source(src: dict) -> ScholarshipSource:
-            return ScholarshipSource(
-                name=src.get("name"),
-                university=src.get("university"),
-                open_time=src.get("open_time"),
-                close_time=src.get("close_time"),
-                amount=src.get("amount"),
-                field_of_study=src.get("field_of_study"),
-                url=src.get("url"),
-            )
+    def _to_scholarship_source(src: dict) -> ScholarshipSource:
+        return ScholarshipSource(
+            name=src.get("name"),
+            university=src.get("university"),
+            open_time=src.get("open_time"),
+            close_time=src.get("close_time"),
+            amount=src.get("amount"),
+            field_of_study=src.get("field_of_study"),
+            url=src.get("url"),
+            close_time_date=src.get("close_time_date"),
+        )
 
-        # Convert ScholarshipFilter to ES filter dicts
-        filters_as_dicts = []
-        if filter:
-            if filter.name:
-                filters_as_dicts.append({
-                    "field": "name",
-                    "values": [filter.name],
-                    "operator": "OR",
-                })
-            if filter.university:
-                filters_as_dicts.append({
-                    "field": "university",
-                    "values": [filter.university],
-                    "operator": "OR",
-                })
-            if filter.field_of_study:
-                filters_as_dicts.append({
-                    "field": "field_of_study",
-                    "values": [filter.field_of_study],
-                    "operator": "OR",
-                })
-            if filter.amount:
-                filters_as_dicts.append({
-                    "field": "amount",
-                    "values": [filter.amount],
-                    "operator": "OR",
-                })
+    # Convert ScholarshipFilter to ES filter dicts
+    filters_as_dicts = []
+    if filter:
+        if filter.name:
+            filters_as_dicts.append({
+                "field": "name",
+                "values": [filter.name],
+                "operator": "OR",
+            })
+        if filter.university:
+            filters_as_dicts.append({
+                "field": "university",
+                "values": [filter.university],
+                "operator": "OR",
+            })
+        if filter.field_of_study:
+            filters_as_dicts.append({
+                "field": "field_of_study",
+                "values": [filter.field_of_study],
+                "operator": "OR",
+            })
+        if filter.amount:
+            filters_as_dicts.append({
+                "field": "amount",
+                "values": [filter.amount],
+                "operator": "OR",
+            })
+        amount_rng = amount_range_filter(filter.min_amount, filter.max_amount)
+        if amount_rng:
+            filters_as_dicts.append(amount_rng)
+        if filter.deadline_after or filter.deadline_before:
+            rng = {"field": "close_time_date", "mode": "range", "format": DATE_FORMAT}
+            if filter.deadline_after:
+                rng["min"] = filter.deadline_after
+            if filter.deadline_before:
+                rng["max"] = filter.deadline_before
+            filters_as_dicts.append(rng)
 
-        # Case 1: No query, no filters - return all sorted by deadline
-        if not q and not filters_as_dicts:
-            query_body = {"bool": {}}
-            if collection:
-                query_body["bool"]["filter"] = [{"term": {"collection": collection}}]
-            
-            if not query_body["bool"]:
-                query_body = {"match_all": {}}
-            
-            search_params = {
-                "index": collection,
-                "query": query_body,
-                "size": size * 5 if sort_by_deadline else size,  # Fetch more for sorting
-                "from_": 0 if sort_by_deadline else offset,
-            }
-            
-            result = es.search(**search_params)
-            
-            hits = [
-                {
-                    "id": h["_id"],
-                    "score": h.get("_score") or 0.0,
-                    "source": h["_source"]
-                }
-                for h in result["hits"]["hits"]
-            ]
-            
-            # Sort by deadline on server side if needed
-            if sort_by_deadline and hits:
-                def parse_date(date_str):
-                    """Parse DD/MM/YYYY to comparable date"""
-                    if not date_str:
-                        return date.max if sort_order.value == "asc" else date.min
-                    try:
-                        if '/' in date_str:
-                            day, month, year = date_str.split('/')
-                            return date(int(year), int(month), int(day))
-                        return date.fromisoformat(date_str)
-                    except:
-                        return date.max if sort_order.value == "asc" else date.min
-                
-                hits.sort(
-                    key=lambda x: parse_date(x.get("source", {}).get("close_time")),
-                    reverse=(sort_order.value == "desc")
-                )
-                
-                # Apply pagination after sorting
-                hits = hits[offset:offset + size]
-            
-            return SearchResult(
-                total=result["hits"]["total"]["value"],
-                items=[
-                    SearchHit(
-                        id=h["id"],
-                        score=h["score"],
-                        source=_to_scholarship_source(h["source"]) if h.get("source") else None,
-                    )
-                    for h in hits
-                ],
-            )
+    sort_field = "close_time" if sort_by_deadline else None
 
-        # Case 2: keyword-only
-        if q and not filters_as_dicts:
-            result = search_keyword(
-                client=es,
-                q=q,
-                index=collection,
-                size=size,
-                offset=offset,
-                collection=collection,
-            )
-            return SearchResult(
-                total=result.get("total", 0),
-                items=[
-                    SearchHit(
-                        id=i["id"],
-                        score=i["score"],
-                        source=_to_scholarship_source(i["source"]) if i.get("source") else None,
-                    )
-                for i in result.get("items", [])
-                ],
-            )
-
-        # Case 3: filters-only
-        if filters_as_dicts and not q:
-            result = filter_advanced(
-                client=es,
-                index=collection,
-                collection=collection,
-                filters=filters_as_dicts,
-                inter_field_operator=inter_field_operator.value,
-                size=size,
-                offset=offset,
-                sort_field="close_time" if sort_by_deadline else None,
-                sort_order=sort_order.value,
-            )
-            return SearchResult(
-                total=result.get("total", 0),
-                items=[
-                    SearchHit(
-                        id=i["id"],
-                        score=i["score"],
-                        source=_to_scholarship_source(i["source"]) if i.get("source") else None,
-                    )
-                for i in result.get("items", [])
-                ],
-            )
+    # Case 1: No query, no filters - return all (sorted by deadline natively in ES)
+    if not q and not filters_as_dicts:
+        result = await filter_advanced(
+            client=es,
+            index=collection,
+            collection=collection,
+            filters=[],
+            size=size,
+            offset=offset,
+            sort_field=sort_field,
+            sort_order=sort_order.value,
+            source_includes=source_fields,
+            after=after,
+            use_cursor=use_cursor,
+            active_only=not include_expired,
+        )
+        prime_hits(loaders, collection, result.get("items", []), partial=source_fields is not None)
+        return SearchResult(
+            total=result.get("total", 0),
+            items=[
+                SearchHit(
+                    id=i["id"],
+                    score=i["score"],
+                    source=_to_scholarship_source(i["source"]) if i.get("source") else None,
+                )
+            for i in result.get("items", [])
+            ],
+            next_cursor=result.get("next_cursor"),
+        )
 
-        # Case 4: both keyword and filters — intersect results, preserve keyword ranking
-        kw = search_keyword(
+    # Case 2: keyword-only
+    if q and not filters_as_dicts:
+        result = await search_keyword(
             client=es,
-            q=q or "",
+            q=q,
             index=collection,
             size=size,
             offset=offset,
             collection=collection,
+            sort_field=sort_field,
+            sort_order=sort_order.value,
+            source_includes=source_fields,
+            after=after,
+            use_cursor=use_cursor,
+            active_only=not include_expired,
         )
-        flt = filter_advanced(
+        prime_hits(loaders, collection, result.get("items", []), partial=source_fields is not None)
+        return SearchResult(
+            total=result.get("total", 0),
+            items=[
+                SearchHit(
+                    id=i["id"],
+                    score=i["score"],
+                    source=_to_scholarship_source(i["source"]) if i.get("source") else None,
+                )
+            for i in result.get("items", [])
+            ],
+            next_cursor=result.get("next_cursor"),
+        )
+
+    # Case 3: filters-only
+    if filters_as_dicts and not q:
+        result = await filter_advanced(
             client=es,
             index=collection,
             collection=collection,
@@ -208,21 +170,54 @@ def search_es(
             inter_field_operator=inter_field_operator.value,
             size=size,
             offset=offset,
-            sort_field="close_time" if sort_by_deadline else None,
+            sort_field=sort_field,
             sort_order=sort_order.value,
+            source_includes=source_fields,
+            after=after,
+            use_cursor=use_cursor,
+            active_only=not include_expired,
+        )
+        prime_hits(loaders, collection, result.get("items", []), partial=source_fields is not None)
+        return SearchResult(
+            total=result.get("total", 0),
+            items=[
+                SearchHit(
+                    id=i["id"],
+                    score=i["score"],
+                    source=_to_scholarship_source(i["source"]) if i.get("source") else None,
+                )
+            for i in result.get("items", [])
+            ],
+            next_cursor=result.get("next_cursor"),
         )
 
-        flt_ids = {i["id"] for i in flt.get("items", [])}
-        merged_items = [
+    # Case 4: both keyword and filters — 1 bool query (must: keyword, filter: clauses)
+    result = await search_combined(
+        client=es,
+        q=q or "",
+        index=collection,
+        collection=collection,
+        filters=filters_as_dicts,
+        inter_field_operator=inter_field_operator.value,
+        size=size,
+        offset=offset,
+        sort_field=sort_field,
+        sort_order=sort_order.value,
+        source_includes=source_fields,
+        after=after,
+        use_cursor=use_cursor,
+        active_only=not include_expired,
+    )
+    prime_hits(loaders, collection, result.get("items", []), partial=source_fields is not None)
+    return SearchResult(
+        total=result.get("total", 0),
+        items=[
             SearchHit(
                 id=i["id"],
                 score=i["score"],
                 source=_to_scholarship_source(i["source"]) if i.get("source") else None,
             )
-            for i in kw.get("items", [])
-            if i["id"] in flt_ids
-        ]
-        return SearchResult(total=len(merged_items), items=merged_items)
-    finally:
-        es.close()
-
+        for i in result.get("items", [])
+        ],
+        next_cursor=result.get("next_cursor"),
+    )
@@ -0,0 +1,46 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import strawberry
+from strawberry.types.nodes import SelectedField, Selection
+
+
+def _flatten(selections: Iterable[Selection]) -> Iterator[SelectedField]:
+    """Duỗi fragment (`...F`, `... on T`) thành danh sách field."""
+    for sel in selections:
+        if isinstance(sel, SelectedField):
+            yield sel
+        else:
+            yield from _flatten(sel.selections)
+
+
+def _children(info: strawberry.Info, path: Sequence[str]) -> List[SelectedField]:
+    level = [child for sel in _flatten(info.selected_fields) for child in _flatten(sel.selections)]
+    for name in path:
+        level = [child for sel in level if sel.name == name for child in _flatten(sel.selections)]
+    return level
+
+
+def is_selected(info: strawberry.Info, name: str) -> bool:
+    """Field `name` (tên GraphQL) có được chọn ngay dưới field của resolver hiện tại không."""
+    return any(sel.name == name for sel in _children(info, ()))
+
+
+def requested_source_fields(
+    info: strawberry.Info,
+    path: Sequence[str],
+    field_map: Dict[str, Sequence[str]],
+) -> Optional[List[str]]:
+    """
+    Các field `_source` ES cần để trả lời selection set của resolver hiện tại.
+    `path`: đường đi tới object chứa dữ liệu source (vd ("items", "source")),
+    `field_map`: tên field GraphQL → field trong `_source` mà nó đọc.
+    Trả về None (= lấy toàn bộ) nếu gặp field lạ không có trong map, để không trả thiếu dữ liệu.
+    """
+    fields = set()
+    for sel in _children(info, path):
+        if sel.name == "__typename":
+            continue
+        if sel.name not in field_map:
+            return None
+        fields.update(field_map[sel.name])
+    return sorted(fields)
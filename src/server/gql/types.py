@@ -3,6 +3,7 @@ from typing import List
 from enum import Enum
 from typing import Optional
 from datetime import date, datetime
+from strawberry.scalars import JSON
 
 @strawberry.type
 class ScholarshipSource:
@@ -17,29 +18,20 @@ class ScholarshipSource:
     amount: Optional[str]
     field_of_study: Optional[str]
     url: Optional[str]
+    # close_time đã chuẩn hoá ISO lúc index (close_time_date), không expose ra schema
+    close_time_date: strawberry.Private[Optional[str]] = None
 
     @strawberry.field(description="Số ngày còn lại trước hạn nộp (computed field)")
     def days_until_deadline(self) -> Optional[str]:
         """Tính số ngày còn lại từ hôm nay đến close_time. Returns 'Expired' if deadline has passed."""
-        if not self.close_time:
-            return None
-        try:
-            # Handle DD/MM/YYYY format
-            if '/' in self.close_time:
-                day, month, year = self.close_time.split('/')
-                end = date(int(year), int(month), int(day))
-            else:
-                # Fallback to ISO format
-                end = date.fromisoformat(self.close_time)
-            today = date.today()
-            days_left = (end - today).days
-            
-            # Return "Expired" if deadline has passed
-            if days_left < 0:
-                return "Expired"
-            return str(days_left)
-        except Exception:
+        if not self.close_time_date:
             return None
+        days_left = (date.fromisoformat(self.close_time_date) - date.today()).days
+
+        # Return "Expired" if deadline has passed
+        if days_left < 0:
+            return "Expired"
+        return str(days_left)
 
 @strawberry.enum
 class InterFieldOperator(str, Enum):
@@ -69,6 +61,12 @@ class ScholarshipFilter:
     university: Optional[str] = None
     field_of_study: Optional[str] = None
     amount: Optional[str] = None
+    # Amount range ("1000", "1,000 USD", "20 triệu VNĐ"), quy về tiền chung rồi lọc trên amount_value
+    min_amount: Optional[str] = None
+    max_amount: Optional[str] = None
+    # Deadline range (DD/MM/YYYY hoặc YYYY-MM-DD), lọc trên close_time đã chuẩn hoá
+    deadline_after: Optional[str] = None
+    deadline_before: Optional[str] = None
 
 
 @strawberry.type
@@ -82,6 +80,8 @@ class SearchHit:
 class SearchResult:
     total: int
     items: List[SearchHit]
+    # Cursor opaque cho trang sau (truyền lại qua `after`); None nếu hết dữ liệu hoặc dùng offset
+    next_cursor: Optional[str] = None
 
 
 # ---- Match Profile domain ----
@@ -98,7 +98,7 @@ class UserProfileInput:
     university: Optional[List[str]] = None  # List of preferred universities
     field_of_study: Optional[str] = None  # Desired field of study
     
-    # Amount/funding preferences
+    # Amount/funding preferences ("1000", "1,000 USD", "20 triệu VNĐ")
     min_amount: Optional[str] = None  # Minimum scholarship amount
     max_amount: Optional[str] = None  # Maximum scholarship amount
     
@@ -127,4 +127,19 @@ class MatchResult:
     items: List[MatchItem]
     hasNextPage: bool
     nextOffset: Optional[int]
+    nextCursor: Optional[str] = None
     warnings: Optional[List[str]] = None
+
+
+# ---- Firestore batch read ----
+
+@strawberry.type
+class FirestoreDocument:
+    id: str
+    data: JSON
+
+
+@strawberry.type
+class FirestoreDocumentBatch:
+    items: List[FirestoreDocument]  # giữ thứ tự ids đầu vào
+    missing: List[str]
@@ -6,35 +6,35 @@ from typing import Dict, Any
 router = APIRouter()
 
 @router.post("/register")
-def register(req: RegisterRequest):
+async def register(req: RegisterRequest):
     try:
         extra_fields = req.dict(exclude={"email", "password", "display_name"}, exclude_unset=True)
-        user = register_user(req.email, req.password, req.display_name, extra_fields)
+        user = await register_user(req.email, req.password, req.display_name, extra_fields)
         return user
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/verify")
-def verify(req: VerifyRequest):
-    payload = verify_token(req.id_token)
+async def verify(req: VerifyRequest):
+    payload = await verify_token(req.id_token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     return payload
 
 
 @router.get("/profile/{uid}")
-def get_user_profile(uid: str):
-    profile = get_profile(uid)
+async def get_user_profile(uid: str):
+    profile = await get_profile(uid)
     if not profile:
         raise HTTPException(status_code=404, detail="User not found")
     return profile
 
 
 @router.put("/profile/{uid}")
-def update_user_profile(uid: str, fields: Dict[str, Any] = Body(...)):
+async def update_user_profile(uid: str, fields: Dict[str, Any] = Body(...)):
     try:
-        updated = update_profile(uid, fields)
+        updated = await update_profile(uid, fields)
         return updated
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
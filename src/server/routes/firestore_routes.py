@@ -1,43 +1,87 @@
 from typing import Optional, Dict, Any, List, Union
-from fastapi import APIRouter, HTTPException,Query,Body
+from fastapi import APIRouter, HTTPException,Query,Body,Depends
 from pydantic import BaseModel, Field
-from services.firestore_svc import save_one_raw, save_many_raw, get_one_raw
+from elasticsearch import AsyncElasticsearch
+from services.firestore_svc import save_one_raw, save_many_raw, get_one_raw, get_many_raw, delete_one, _ensure_valid_collection, BATCH_GET_MAX_IDS
+from services.ingest_svc import ingest_many
+from services.es_client import get_es, bulk_client
 router = APIRouter()
 
 class DocOut(BaseModel):
     id: str
     data: Dict[str, Any]
 
+class BatchGetIn(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_GET_MAX_IDS)
+
+class BatchGetOut(BaseModel):
+    items: List[DocOut]
+    missing: List[str]
+
 @router.post("/{collection}")
-def upsert_documents(
+async def upsert_documents(
     collection: str,
     payload: Union[Dict[str, Any], List[Dict[str, Any]]] = Body(
         ..., 
         example={"Scholarship_Name": "Chevening", "Country": "UK"}
     ),
+    index: bool = Query(False, description="Bulk ingest: commit batch song song và index luôn sang ES"),
+    es: AsyncElasticsearch = Depends(get_es),
 ):
     """
     Upsert document(s) vào Firestore.
     - Nếu body là 1 object → lưu 1 record.
     - Nếu body là 1 array object → lưu nhiều record.
+    - Array + `?index=true` → ghi Firestore + ES cùng lúc, trả trạng thái từng row
+      (collection không được sync lên ES thì chỉ ghi Firestore, `es` = "skipped").
     - Doc_id sẽ được auto-generate.
     """
     try:
-        if isinstance(payload, list):
-            ids = save_many_raw(collection, rows=payload)
-            return {"inserted_ids": ids}
-        else:
-            saved_id = save_one_raw(collection, data=payload)
-            return {"id": saved_id, "data": payload}
+        _ensure_valid_collection(collection)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid collection name")
 
+    if isinstance(payload, list) and index:
+        summary = await ingest_many(bulk_client(es), collection, payload)
+        return {"status": "ok" if not summary["failed"] else "partial", **summary}
+    if isinstance(payload, list):
+        ids = await save_many_raw(collection, rows=payload)
+        return {"inserted_ids": ids}
+    else:
+        saved_id = await save_one_raw(collection, data=payload)
+        return {"id": saved_id, "data": payload}
+
 @router.get("/{collection}/{doc_id}", response_model=DocOut)
-def read_document(collection: str, doc_id: str):
+async def read_document(collection: str, doc_id: str):
     try:
-        doc = get_one_raw(collection, doc_id)
+        doc = await get_one_raw(collection, doc_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid collection name")
     if not doc:
         raise HTTPException(status_code=404, detail="Not found")
     return DocOut(id=doc_id, data=doc)
+
+@router.post("/{collection}/batch", response_model=BatchGetOut)
+async def read_documents(collection: str, payload: BatchGetIn):
+    """
+    Đọc nhiều document trong 1 request (thay cho N lần GET).
+    `items` giữ thứ tự `ids` gửi lên, id không tồn tại / đã xoá nằm trong `missing`.
+    """
+    try:
+        docs = await get_many_raw(collection, payload.ids)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid collection name")
+    items = [DocOut(id=doc_id, data=doc) for doc_id, doc in zip(payload.ids, docs) if doc is not None]
+    missing = [doc_id for doc_id, doc in zip(payload.ids, docs) if doc is None]
+    return BatchGetOut(items=items, missing=missing)
+
+@router.delete("/{collection}/{doc_id}")
+async def delete_document(collection: str, doc_id: str):
+    """
+    Xoá mềm document (ghi tombstone) → lần sync delta tiếp theo sẽ xoá khỏi ES.
+    """
+    try:
+        deleted_id = await delete_one(collection, doc_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid collection name")
+    return {"id": deleted_id, "deleted": True}
@@ -1,42 +1,53 @@
-from fastapi import APIRouter
-from elasticsearch import Elasticsearch
-import os
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from elasticsearch import AsyncElasticsearch
+from services.es_client import get_es, ES_SEARCH_INDEX
+from services.sync_job import get_sync_state
 
 router = APIRouter()
 
-ES_HOST = os.getenv("ELASTICSEARCH_HOST")
-ES_USER = os.getenv("ELASTIC_USER")
-ES_PASS = os.getenv("ELASTIC_PASSWORD")
-
 @router.get("/live")
-def live():
+async def live():
     return {"status": "ok"}
 
 @router.get("/ready")
-def ready():
-    es = Elasticsearch(
-        hosts=[ES_HOST],
-        basic_auth=(ES_USER, ES_PASS),  # nếu có auth
-        verify_certs=False,
-        max_retries=30,
-        retry_on_timeout=True,
-        request_timeout=30,
-    )
+async def ready(es: AsyncElasticsearch = Depends(get_es)):
+    """
+    Ready khi ES trả lời và index search đã có dữ liệu.
+    Không chờ sync: nếu sync nền đang chạy mà index đã có doc thì vẫn ready.
+    """
+    sync = get_sync_state()
+    sync_info = {
+        "status": sync["status"],
+        "docs_done": sync["docs_done"],
+        "eta_seconds": sync["eta_seconds"],
+    }
     try:
-        if es.ping():
-            info = es.info()
-            return {
-                "status": "ok",
+        if not await es.ping():
+            return JSONResponse(
+                status_code=503,
+                content={"status": "degraded", "elasticsearch": "ping failed", "sync": sync_info},
+            )
+
+        info = await es.info()
+        index_exists = bool(await es.indices.exists(index=ES_SEARCH_INDEX))
+        doc_count = (await es.count(index=ES_SEARCH_INDEX))["count"] if index_exists else 0
+        is_ready = doc_count > 0
+        return JSONResponse(
+            status_code=200 if is_ready else 503,
+            content={
+                "status": "ok" if is_ready else "warming",
                 "elasticsearch": {
                     "name": info.get("name"),
                     "cluster_name": info.get("cluster_name"),
                     "version": info.get("version", {}).get("number"),
-                }
-            }
-        else:
-            return {"status": "degraded", "elasticsearch": "ping failed"}
+                },
+                "index": {"name": ES_SEARCH_INDEX, "exists": index_exists, "docs": doc_count},
+                "sync": sync_info,
+            },
+        )
     except Exception as e:
-        return {"status": "error", "elasticsearch": str(e)}
-    finally:
-        es.close()
-
+        return JSONResponse(
+            status_code=503,
+            content={"status": "error", "elasticsearch": str(e), "sync": sync_info},
+        )
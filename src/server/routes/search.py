@@ -1,36 +1,118 @@
 # routes/search.py
-import os
-from fastapi import APIRouter, Body, Query
-from elasticsearch import Elasticsearch
-from services.es_svc import index_many
-from firebase_admin import firestore
+from fastapi import APIRouter, Depends, HTTPException, Query
+from elasticsearch import ApiError, AsyncElasticsearch
+from services.es_client import get_es, bulk_client, ES_SEARCH_INDEX
+from services.es_svc import migrate_text_mapping, rebuild_index, gc_index_versions
+from services.sync_svc import sync_collection_by_name, rebuild_collection_index
+from services.sync_job import get_sync_state, start_background_sync
+from services.cache_svc import query_cache
+from services.active_job import get_active_refresh_state, run_active_refresh
 
 router = APIRouter()
-ES_HOST = os.getenv("ELASTICSEARCH_HOST")
-ES_USER = os.getenv("ELASTIC_USER")
-ES_PASS = os.getenv("ELASTIC_PASSWORD")
 
 @router.post("/sync")
-def sync_firestore_to_es(
+async def sync_firestore_to_es(
     collection: str = Query(..., description="Tên Firestore collection cần sync"),
+    full: bool = Query(False, description="Bỏ qua checkpoint, sync lại toàn bộ collection"),
+    es: AsyncElasticsearch = Depends(get_es),
 ):
-    db = firestore.client()
-    docs = db.collection(collection).stream()
-    items = [{"id": doc.id, **doc.to_dict()} for doc in docs]
-
-    if not items:
-        return {"status": "ok", "message": f"No documents in collection '{collection}'"}
-
-    es = Elasticsearch(
-        hosts=[ES_HOST],
-        basic_auth=(ES_USER, ES_PASS),
-        verify_certs=False,
-        max_retries=30,
-        retry_on_timeout=True,
-        request_timeout=30,
-    )
     try:
-        count = index_many(es, items, index=collection, collection=collection)
-        return {"status": "ok", "indexed": count, "collection": collection}
-    finally:
-        es.close()
\ No newline at end of file
+        summary = await sync_collection_by_name(bulk_client(es), collection, full=full)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not summary["indexed"] and not summary["failed"]:
+        return {
+            "status": "ok",
+            "mode": summary["mode"],
+            "message": f"No changed documents in collection '{collection}'",
+        }
+
+    return {
+        "status": "ok" if not summary["failed"] else "partial",
+        "indexed": summary["indexed"],
+        "failed": summary["failed"],
+        "collection": collection,
+        "mode": summary["mode"],
+        "watermark": summary.get("watermark"),
+        "chunks": summary["chunks"],
+    }
+
+
+@router.post("/sync/all", status_code=202)
+async def sync_all_in_background(es: AsyncElasticsearch = Depends(get_es)):
+    """Chạy sync toàn bộ collections ở nền (chỉ 1 replica chạy nhờ lease)."""
+    started = start_background_sync(bulk_client(es))
+    return {"started": started, "sync": get_sync_state()}
+
+
+@router.get("/sync/status")
+async def sync_status():
+    """Trạng thái sync nền: idle / running / failed, số doc đã xử lý, ETA."""
+    return get_sync_state()
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit / miss của cache kết quả searchEs & matchScholarships."""
+    return query_cache.stats()
+
+
+@router.post("/active/refresh")
+async def refresh_active(es: AsyncElasticsearch = Depends(get_es)):
+    """Chạy ngay job tắt cờ `active` cho học bổng đã quá hạn (bình thường chạy định kỳ)."""
+    updated = await run_active_refresh(bulk_client(es))
+    return {"updated": updated, "active_refresh": get_active_refresh_state()}
+
+
+@router.get("/active/status")
+async def active_status():
+    return get_active_refresh_state()
+
+
+@router.post("/migrate")
+async def migrate_index_mapping(
+    index: str = Query(ES_SEARCH_INDEX, description="Index legacy cần chuyển sang mapping copy_to"),
+    es: AsyncElasticsearch = Depends(get_es),
+):
+    """
+    Reindex index legacy (`__text` trong _source) sang mapping copy_to và thay bằng alias cùng tên.
+    Nên chạy `POST /sync?full=true` sau đó để bù doc ghi vào trong lúc reindex.
+    """
+    try:
+        return await migrate_text_mapping(bulk_client(es).options(request_timeout=600), index)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ApiError as e:
+        raise HTTPException(status_code=502, detail=f"Elasticsearch error: {e.error}")
+
+
+@router.post("/reindex")
+async def reindex_collection(
+    index: str = Query(ES_SEARCH_INDEX, description="Alias (tên collection) cần dựng lại"),
+    source: str = Query("firestore", pattern="^(firestore|es)$", description="Nạp lại từ Firestore hay reindex từ bản ES hiện tại"),
+    es: AsyncElasticsearch = Depends(get_es),
+):
+    """
+    Dựng bản `<index>_v{N}` mới (mapping hiện tại), làm nóng rồi swap alias nguyên tử; bản cũ được dọn.
+    Search vẫn phục vụ từ bản cũ cho tới lúc swap.
+    """
+    client = bulk_client(es).options(request_timeout=600)
+    try:
+        if source == "es":
+            return await rebuild_index(client, index)
+        return await rebuild_collection_index(client, index)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ApiError as e:
+        raise HTTPException(status_code=502, detail=f"Elasticsearch error: {e.error}")
+
+
+@router.post("/reindex/gc")
+async def gc_old_index_versions(
+    index: str = Query(ES_SEARCH_INDEX, description="Alias cần dọn bản cũ"),
+    keep: int = Query(1, ge=0, description="Số bản cũ giữ lại để rollback"),
+    es: AsyncElasticsearch = Depends(get_es),
+):
+    return {"index": index, "deleted": await gc_index_versions(es, index, keep=keep)}
+
@@ -0,0 +1,70 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from elasticsearch import AsyncElasticsearch
+
+from services.es_svc import collection_indices, refresh_active_flags
+from services.sync_svc import is_syncable
+
+# Chu kỳ tắt cờ `active` của học bổng đã quá hạn (giây). 0 = tắt job.
+ACTIVE_REFRESH_INTERVAL_SECONDS = float(os.getenv("ACTIVE_REFRESH_INTERVAL_SECONDS", "3600"))
+
+_state: Dict[str, Any] = {
+    "interval_seconds": ACTIVE_REFRESH_INTERVAL_SECONDS,
+    "last_run_at": None,
+    "last_updated": None,
+    "indices": None,
+    "error": None,
+}
+_task: Optional[asyncio.Task] = None
+
+
+def get_active_refresh_state() -> Dict[str, Any]:
+    return dict(_state)
+
+
+async def run_active_refresh(client: AsyncElasticsearch) -> int:
+    try:
+        # searchEs lọc `active` ở mọi collection → refresh mọi collection được sync lên ES (trừ users...)
+        indices = [name for name in await collection_indices(client) if is_syncable(name)]
+        # index=[] nghĩa là mọi index → không gọi khi chưa có collection nào
+        updated = await refresh_active_flags(client, indices) if indices else 0
+        _state.update(last_updated=updated, indices=indices, error=None)
+        if updated:
+            print(f"✅ Marked {updated} expired scholarships as inactive")
+        return updated
+    except Exception as e:
+        _state.update(error=str(e))
+        raise
+    finally:
+        _state["last_run_at"] = datetime.now(timezone.utc).isoformat()
+
+
+async def _loop(client: AsyncElasticsearch) -> None:
+    # Chạy ngay lúc startup (gắn cờ cho doc cũ), sau đó theo chu kỳ.
+    # update_by_query chỉ đụng doc cần đổi nên không cần lease giữa các replica.
+    while True:
+        try:
+            await run_active_refresh(client)
+        except Exception as e:
+            print(f"⚠️ Active flag refresh failed: {e}")
+        await asyncio.sleep(ACTIVE_REFRESH_INTERVAL_SECONDS)
+
+
+def start_active_refresh(client: AsyncElasticsearch) -> bool:
+    global _task
+    if ACTIVE_REFRESH_INTERVAL_SECONDS <= 0 or (_task and not _task.done()):
+        return False
+    _task = asyncio.create_task(_loop(client), name="es-active-refresh")
+    return True
+
+
+async def stop_active_refresh() -> None:
+    if _task and not _task.done():
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,153 @@
+import json
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+# Tiền tệ chung để so sánh / range filter (amount_value luôn quy về đồng này)
+AMOUNT_BASE_CURRENCY = os.getenv("AMOUNT_BASE_CURRENCY", "USD").upper()
+
+# Giá trị 1 đơn vị tiền tệ tính theo USD. Override bằng env FX_RATES='{"VND": 0.00004, ...}'
+_DEFAULT_FX_RATES: Dict[str, float] = {
+    "USD": 1.0,
+    "VND": 0.000039,
+    "EUR": 1.08,
+    "GBP": 1.27,
+    "JPY": 0.0067,
+    "KRW": 0.00073,
+    "CNY": 0.14,
+    "AUD": 0.66,
+    "NZD": 0.60,
+    "CAD": 0.73,
+    "SGD": 0.74,
+    "CHF": 1.13,
+}
+FX_RATES: Dict[str, float] = {**_DEFAULT_FX_RATES, **{k.upper(): float(v) for k, v in json.loads(os.getenv("FX_RATES", "{}")).items()}}
+
+# Cách viết tiền tệ bằng chữ → mã ISO; chỉ khớp nguyên từ, không phân biệt hoa thường
+# ("1000 academic allowance" không phải CAD, "Europe" không phải EUR, "Đức" không phải VND).
+# Mã ISO được kiểm tra trước ký hiệu (vd "Học bổng Đức 1000 EUR" phải ra EUR).
+_CURRENCY_WORDS = [
+    ("USD", "USD"), ("VND", "VND"), ("VNĐ", "VND"), ("EUR", "EUR"), ("GBP", "GBP"),
+    ("JPY", "JPY"), ("KRW", "KRW"), ("CNY", "CNY"), ("RMB", "CNY"), ("AUD", "AUD"),
+    ("NZD", "NZD"), ("CAD", "CAD"), ("SGD", "SGD"), ("CHF", "CHF"),
+    ("YEN", "JPY"), ("WON", "KRW"), ("ĐỒNG", "VND"), ("Đ", "VND"),
+]
+_CURRENCY_WORD_RES = [
+    (re.compile(rf"(?<![^\W\d_]){re.escape(word)}(?![^\W\d_])", re.IGNORECASE), code) for word, code in _CURRENCY_WORDS
+]
+# Ký hiệu: khớp ở bất kỳ đâu ("$2.5k", "€1,000")
+_CURRENCY_SYMBOLS = [
+    ("US$", "USD"), ("A$", "AUD"), ("S$", "SGD"), ("$", "USD"),
+    ("€", "EUR"), ("£", "GBP"), ("¥", "JPY"), ("₩", "KRW"), ("₫", "VND"),
+]
+
+_MULTIPLIERS = {
+    "tỷ": 1e9, "ty": 1e9, "billion": 1e9, "bn": 1e9,
+    "triệu": 1e6, "trieu": 1e6, "million": 1e6, "m": 1e6,
+    "nghìn": 1e3, "ngàn": 1e3, "nghin": 1e3, "k": 1e3, "thousand": 1e3,
+}
+# Hệ số tiếng Việt: không ghi đơn vị ("15 triệu") thì hiểu là VND
+_VND_MULTIPLIERS = {"tỷ", "ty", "triệu", "trieu", "nghìn", "ngàn", "nghin"}
+
+_NUMBER_RE = re.compile(r"(\d[\d.,]*)\s*([^\d\s.,/-]*)")
+
+
+def _to_number(token: str) -> Optional[float]:
+    """
+    "10,000,000" / "10.000.000" → 10000000, "1,5" / "1.5" → 1.5, "1,234.56" → 1234.56.
+    Khi có cả ',' và '.', dấu xuất hiện sau cùng là dấu thập phân.
+    """
+    token = token.strip(".,")
+    if not token:
+        return None
+    if "," in token and "." in token:
+        dec = "," if token.rfind(",") > token.rfind(".") else "."
+        thousands = "." if dec == "," else ","
+        token = token.replace(thousands, "").replace(dec, ".")
+    else:
+        sep = "," if "," in token else "." if "." in token else None
+        if sep:
+            groups = token.split(sep)
+            if len(groups) > 2 or all(len(g) == 3 for g in groups[1:]):
+                token = token.replace(sep, "")  # phân cách hàng nghìn
+            else:
+                token = token.replace(sep, ".")  # dấu thập phân
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def detect_currency(text: str) -> Optional[str]:
+    for pattern, code in _CURRENCY_WORD_RES:
+        if pattern.search(text):
+            return code
+    for symbol, code in _CURRENCY_SYMBOLS:
+        if symbol in text:
+            return code
+    return None
+
+
+def parse_amount(text) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Parse chuỗi số tiền tự do ("450 USD", "10,000,000 VNĐ", "15 triệu đồng", "$2.5k")
+    → (giá trị số theo tiền gốc, mã tiền tệ). Khoảng ("5,000 - 10,000 USD") lấy số đầu tiên.
+    Trả về (None, None) nếu không tìm thấy số.
+    """
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        return float(text), None
+    if not text or not isinstance(text, str):
+        return None, None
+
+    m = _NUMBER_RE.search(text)
+    if not m:
+        return None, None
+    value = _to_number(m.group(1))
+    if value is None:
+        return None, None
+
+    suffix = m.group(2).lower()
+    if suffix.startswith("%"):
+        return None, None  # "50% tuition" là tỉ lệ, không phải số tiền
+    if suffix not in _MULTIPLIERS:
+        # "15 triệu đồng": hệ số nằm ở từ kế tiếp
+        rest = text[m.end():].strip().lower().split()
+        suffix = rest[0] if rest else ""
+    if suffix in _MULTIPLIERS:
+        value *= _MULTIPLIERS[suffix]
+
+    currency = detect_currency(text)
+    if currency is None and suffix in _VND_MULTIPLIERS:
+        currency = "VND"
+    return value, currency
+
+
+def to_base_currency(value: float, currency: Optional[str]) -> Optional[float]:
+    """Quy đổi về AMOUNT_BASE_CURRENCY. Không rõ tiền tệ thì coi như đã là tiền gốc."""
+    cur = (currency or AMOUNT_BASE_CURRENCY).upper()
+    if cur not in FX_RATES or AMOUNT_BASE_CURRENCY not in FX_RATES:
+        return None
+    return round(value * FX_RATES[cur] / FX_RATES[AMOUNT_BASE_CURRENCY], 2)
+
+
+def normalize_amount(text) -> Tuple[Optional[float], Optional[str]]:
+    """(amount_value theo tiền chung, amount_currency gốc) cho field `amount` của học bổng."""
+    value, currency = parse_amount(text)
+    if value is None:
+        return None, None
+    return to_base_currency(value, currency), currency
+
+
+def amount_range_filter(min_amount: Optional[str], max_amount: Optional[str]) -> Optional[Dict]:
+    """
+    min/max do người dùng nhập ("1000", "1,000 USD", "20 triệu VNĐ") → filter dict
+    dạng range trên amount_value (đã quy về tiền chung). None nếu không parse được gì.
+    """
+    rng: Dict = {"field": "amount_value", "mode": "range"}
+    for key, text in (("min", min_amount), ("max", max_amount)):
+        value, currency = parse_amount(text)
+        if value is not None:
+            converted = to_base_currency(value, currency)
+            if converted is not None:
+                rng[key] = converted
+    return rng if ("min" in rng or "max" in rng) else None
@@ -1,20 +1,36 @@
+import asyncio
+import hashlib
+import os
+import time
 from typing import Optional, Dict, Any
-from firebase_admin import auth as firebase_auth, firestore
-from services.firestore_svc import save_with_id, get_one_raw
-
-
-def _ensure_user_in_firestore(uid: str, user_doc: Dict[str, Any]) -> None:
+from firebase_admin import auth as firebase_auth, firestore_async
+from services.firestore_svc import save_with_id, get_one_raw, create_if_absent, _stamp
+from services.cache_svc import MemoryCache
+from services.metrics_svc import AUTH_VERIFY_SECONDS, AUTH_VERIFY_FAILURES
+from services.trace_svc import span
+
+AUTH_TOKEN_CACHE_MAXSIZE = int(os.getenv("AUTH_TOKEN_CACHE_MAXSIZE", "10000"))
+AUTH_PROVISIONED_CACHE_MAXSIZE = int(os.getenv("AUTH_PROVISIONED_CACHE_MAXSIZE", "100000"))
+# Bật để kiểm tra token bị thu hồi (tốn thêm 1 lần gọi Firebase). Khi bật, token
+# đã cache vẫn được kiểm tra lại sau mỗi AUTH_REVOCATION_RECHECK_SECONDS.
+AUTH_CHECK_REVOKED = os.getenv("AUTH_CHECK_REVOKED", "false").lower() == "true"
+AUTH_REVOCATION_RECHECK_SECONDS = float(os.getenv("AUTH_REVOCATION_RECHECK_SECONDS", "300"))
+
+# sha256(token) → decoded claims, hết hạn đúng lúc token hết hạn (`exp`)
+_token_cache = MemoryCache(maxsize=AUTH_TOKEN_CACHE_MAXSIZE)
+# uid đã chắc chắn có doc trong 'users' → không đọc Firestore lại trong process này
+_provisioned_uids = MemoryCache(maxsize=AUTH_PROVISIONED_CACHE_MAXSIZE, ttl=float("inf"))
+
+
+async def _ensure_user_in_firestore(uid: str, user_doc: Dict[str, Any]) -> None:
     """
     Đảm bảo user tồn tại trong Firestore collection 'users'.
-    Nếu chưa có thì tạo mới.
+    Nếu chưa có thì tạo mới (create-if-absent, 1 round trip, không race giữa 2 lần login).
     """
-    profile = get_one_raw("users", uid)
-    if profile:
-        return
-    save_with_id("users", uid, user_doc)
+    await create_if_absent("users", uid, user_doc)
 
 
-def register_user(
+async def register_user(
     email: str,
     password: str,
     display_name: Optional[str] = None,
@@ -24,7 +40,9 @@ def register_user(
     Tạo user mới trong Firebase Authentication + lưu vào Firestore collection 'users'.
     extra_fields: chứa các field bổ sung (thông tin cá nhân, học bổng, CV...).
     """
-    user = firebase_auth.create_user(
+    # Firebase Admin SDK là sync → chạy trong thread để không chặn event loop
+    user = await asyncio.to_thread(
+        firebase_auth.create_user,
         email=email,
         password=password,
         display_name=display_name,
@@ -38,7 +56,8 @@ def register_user(
     if extra_fields:
         user_doc.update(extra_fields)
 
-    save_with_id("users", user.uid, user_doc)
+    await save_with_id("users", user.uid, user_doc)
+    await _provisioned_uids.set(user.uid, True)
 
     return {
         "uid": user.uid,
@@ -47,17 +66,39 @@ def register_user(
     }
 
 
-def verify_token(id_token: str) -> Optional[Dict]:
+async def verify_token(id_token: str) -> Optional[Dict]:
     """
     Xác thực Firebase ID token (FE gửi lên sau khi login).
     Nếu user mới login lần đầu (Google/Email) thì đồng bộ vào Firestore.
+    Token đã xác thực được cache tới `exp`; việc kiểm tra doc 'users' chỉ chạy 1 lần / uid / process.
     """
-    try:
-        decoded = firebase_auth.verify_id_token(id_token)
-    except Exception:
-        return None
+    started = time.perf_counter()
+    key = hashlib.sha256(id_token.encode()).hexdigest()
+    decoded = await _token_cache.get(key)
+    if decoded is not None:
+        AUTH_VERIFY_SECONDS.labels("hit").observe(time.perf_counter() - started)
+    else:
+        try:
+            with span("auth.verify_id_token", check_revoked=AUTH_CHECK_REVOKED):
+                decoded = await asyncio.to_thread(
+                    firebase_auth.verify_id_token, id_token, check_revoked=AUTH_CHECK_REVOKED
+                )
+        except Exception:
+            AUTH_VERIFY_FAILURES.inc()
+            return None
+        finally:
+            AUTH_VERIFY_SECONDS.labels("miss").observe(time.perf_counter() - started)
+
+        ttl = decoded.get("exp", 0) - time.time()
+        if AUTH_CHECK_REVOKED:
+            ttl = min(ttl, AUTH_REVOCATION_RECHECK_SECONDS)
+        if ttl > 0:
+            await _token_cache.set(key, decoded, ttl=ttl)
 
     uid = decoded["uid"]
+    if await _provisioned_uids.get(uid):
+        return dict(decoded)
+
     email = decoded.get("email")
     display_name = decoded.get("name") or decoded.get("displayName")
     provider = decoded.get("firebase", {}).get("sign_in_provider")
@@ -68,30 +109,33 @@ def verify_token(id_token: str) -> Optional[Dict]:
         "provider": provider,
     }
 
-    _ensure_user_in_firestore(uid, user_doc)
+    await _ensure_user_in_firestore(uid, user_doc)
+    await _provisioned_uids.set(uid, True)
 
-    return decoded
+    return dict(decoded)
 
 
 # ======================
 # Profile Management
 # ======================
 
-def get_profile(uid: str) -> Optional[Dict[str, Any]]:
+async def get_profile(uid: str) -> Optional[Dict[str, Any]]:
     """
     Lấy profile user từ Firestore.
     """
-    return get_one_raw("users", uid)
+    return await get_one_raw("users", uid)
 
 
-def update_profile(uid: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+async def update_profile(uid: str, fields: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Cập nhật profile user trong Firestore (merge fields mới vào).
+    Cập nhật profile user trong Firestore (merge fields mới vào), 1 round trip.
+    Trả về các field vừa merge + `updated_at` (thời điểm server ghi),
+    không đọc lại cả doc; dùng get_profile nếu cần toàn bộ profile.
     """
-    db = firestore.client()
+    db = firestore_async.client()
     ref = db.collection("users").document(uid)
 
     # chỉ update những field được gửi lên
-    ref.set(fields, merge=True)
+    result = await ref.set(_stamp(fields), merge=True)
 
-    return ref.get().to_dict()
+    return {**fields, "uid": uid, "updated_at": result.update_time}
@@ -0,0 +1,199 @@
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import pickle
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from services.trace_svc import span
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "memory").lower()  # memory | redis
+QUERY_CACHE_URL = os.getenv("QUERY_CACHE_URL", "redis://localhost:6379/0")
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "30"))
+QUERY_CACHE_MAXSIZE = int(os.getenv("QUERY_CACHE_MAXSIZE", "1024"))
+
+
+class MemoryCache:
+    """LRU + TTL trong process. Không có await bên trong nên an toàn trong 1 event loop."""
+
+    def __init__(self, maxsize: int = QUERY_CACHE_MAXSIZE, ttl: float = QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._data.clear()
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Backend dùng chung giữa các replica, cho bất kỳ client tương thích `redis.asyncio`
+    (get / set(ex=) / incr). Truyền `client` để thay bằng stand-in local khi test.
+    Invalidate = tăng số "generation" → mọi key cũ tự hết hiệu lực, không cần SCAN/DEL.
+    """
+
+    GEN_KEY = "query_cache:gen"
+
+    def __init__(self, url: str = QUERY_CACHE_URL, ttl: float = QUERY_CACHE_TTL, client: Any = None):
+        if client is None:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError as e:
+                raise RuntimeError("QUERY_CACHE_BACKEND=redis requires `pip install redis`") from e
+            client = redis_asyncio.from_url(url)
+        self.client = client
+        self.ttl = ttl
+
+    async def _gen(self) -> str:
+        gen = await self.client.get(self.GEN_KEY)
+        return gen.decode() if isinstance(gen, bytes) else str(gen or 0)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(f"query_cache:{await self._gen()}:{key}")
+        return pickle.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any) -> None:
+        await self.client.set(
+            f"query_cache:{await self._gen()}:{key}", pickle.dumps(value), ex=max(1, int(self.ttl))
+        )
+
+    async def clear(self) -> None:
+        await self.client.incr(self.GEN_KEY)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class QueryCache:
+    """Bọc backend + đếm hit/miss để expose metrics."""
+
+    def __init__(self, backend, enabled: bool = QUERY_CACHE_ENABLED):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            value = await self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        try:
+            await self.backend.set(key, value)
+        except Exception:
+            self.errors += 1
+
+    async def invalidate(self) -> None:
+        self.invalidations += 1
+        try:
+            await self.backend.clear()
+        except Exception:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "size": self.backend.size(),
+        }
+
+
+def _build_query_cache() -> QueryCache:
+    backend = RedisCache() if QUERY_CACHE_BACKEND == "redis" else MemoryCache()
+    return QueryCache(backend)
+
+
+query_cache = _build_query_cache()
+
+
+# ======================
+# Key + decorator
+# ======================
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        # strawberry input (ScholarshipFilter, UserProfileInput) → dict, bỏ field None
+        return {k: _normalize(v) for k, v in dataclasses.asdict(value).items() if v is not None}
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())  # gộp khoảng trắng thừa
+    return value
+
+
+def make_key(namespace: str, **kwargs) -> str:
+    payload = json.dumps(_normalize(kwargs), sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+def cached_query(namespace: str):
+    """
+    Cache kết quả resolver theo các keyword argument đã chuẩn hoá
+    (bỏ qua tham số vị trí, vd ES client).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(f"resolver.{namespace}") as s:
+                key = make_key(namespace, **kwargs)
+                with span("cache.lookup"):
+                    hit = await query_cache.get(key)
+                if s is not None:
+                    s.set("cache.hit", hit is not None)
+                if hit is not None:
+                    return hit
+                result = await fn(*args, **kwargs)
+                with span("cache.store"):
+                    await query_cache.set(key, result)
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,55 @@
+import os
+from elasticsearch import AsyncElasticsearch
+from fastapi import Request
+
+ES_HOST = os.getenv("ELASTICSEARCH_HOST")
+ES_USER = os.getenv("ELASTIC_USER")
+ES_PASS = os.getenv("ELASTIC_PASSWORD")
+
+# Index phục vụ search/match (dùng cho readiness)
+ES_SEARCH_INDEX = os.getenv("ES_SEARCH_INDEX", "scholar_lens")
+
+# Pool / timeout tuning (override qua env khi deploy)
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "25"))
+ES_KEEPALIVE = os.getenv("ES_KEEPALIVE", "true").lower() == "true"
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "10"))
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "3"))
+
+# Timeout dài hơn cho sync / bulk (không nằm trên hot path của request)
+ES_BULK_TIMEOUT = float(os.getenv("ES_BULK_TIMEOUT", "60"))
+ES_BULK_MAX_RETRIES = int(os.getenv("ES_BULK_MAX_RETRIES", "30"))
+
+# Thời gian giữ point-in-time giữa 2 trang khi phân trang bằng cursor
+ES_PIT_KEEP_ALIVE = os.getenv("ES_PIT_KEEP_ALIVE", "2m")
+
+
+def create_es_client() -> AsyncElasticsearch:
+    """
+    Tạo 1 AsyncElasticsearch client dùng chung cho cả app (gọi 1 lần trong lifespan).
+    Client giữ connection pool (connections_per_node) và tái sử dụng kết nối
+    giữa các request thay vì handshake TCP/TLS mới mỗi lần.
+    """
+    return AsyncElasticsearch(
+        hosts=[ES_HOST],
+        basic_auth=(ES_USER, ES_PASS),
+        verify_certs=False,
+        connections_per_node=ES_CONNECTIONS_PER_NODE,
+        headers={"connection": "keep-alive" if ES_KEEPALIVE else "close"},
+        max_retries=ES_MAX_RETRIES,
+        retry_on_timeout=True,
+        request_timeout=ES_REQUEST_TIMEOUT,
+    )
+
+
+def bulk_client(client: AsyncElasticsearch) -> AsyncElasticsearch:
+    """Cùng connection pool, nhưng timeout/retry nới rộng cho sync & bulk."""
+    return client.options(
+        request_timeout=ES_BULK_TIMEOUT,
+        max_retries=ES_BULK_MAX_RETRIES,
+        retry_on_timeout=True,
+    )
+
+
+def get_es(request: Request) -> AsyncElasticsearch:
+    """FastAPI dependency: trả về client dùng chung đã tạo trong lifespan."""
+    return request.app.state.es
@@ -1,33 +1,212 @@
-from typing import Any, Dict, Iterable, List, Optional, Literal
-from elasticsearch import Elasticsearch, helpers
-
-def ensure_index(client: Elasticsearch, index: str) -> str:
-    if not client.indices.exists(index=index):
-        client.indices.create(
-            index=index,
-            settings={
-                "analysis": {
-                    "analyzer": {
-                        "vi_std": {"type": "standard", "stopwords": "_none_"}
-                    }
-                }
-            },
-            mappings={
-                "properties": {
-                    "collection": {"type": "keyword"},
-                    "__text": {"type": "text", "analyzer": "vi_std"},
-                    "Scholarship_Name": {
-                        "type": "text",
-                        "analyzer": "vi_std",
-                        "fields": {"raw": {"type": "keyword"}},
-                    },
-                }
-            },
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import date
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Literal, Tuple, Union
+from elasticsearch import AsyncElasticsearch, NotFoundError, helpers
+from services.amount_svc import normalize_amount
+from services.cache_svc import query_cache
+from services.es_client import ES_PIT_KEEP_ALIVE, ES_SEARCH_INDEX
+from services.metrics_svc import ES_CALL_SECONDS, es_timed
+
+# Registry (cấp process) các index đã biết là tồn tại → chỉ gọi indices.exists 1 lần / index
+_known_indices: set = set()
+# Index tạo trước mapping copy_to (vẫn cần `__text` dựng sẵn trong _source cho tới khi migrate)
+_legacy_indices: set = set()
+# Tên trong registry là alias → ghi với require_alias, để ES không tự tạo index dynamic mapping
+# cùng tên khi alias đã bị xoá phía ES (registry cũ)
+_alias_names: set = set()
+_known_indices_lock = threading.Lock()
+
+# Field ngày dạng chuỗi DD/MM/YYYY → được index thêm bản `<field>_date` kiểu date
+DATE_FIELDS = ("open_time", "close_time")
+DATE_FORMAT = "strict_date||dd/MM/yyyy"
+
+# Học bổng còn hạn: `active` tính lúc index từ close_time_date, job định kỳ tắt cờ khi quá hạn.
+# Doc cũ chưa có cờ vẫn được coi là còn hạn cho tới lần refresh đầu tiên.
+ACTIVE_FILTER = {"bool": {"must_not": [{"term": {"active": False}}]}}
+
+# Field nội bộ, không bao giờ trả về client (catch-all text rất lớn)
+SOURCE_EXCLUDES = ["__text"]
+
+# Phiên bản mapping (lưu trong `_meta`). 2 = full-text qua copy_to thay cho `__text` dựng bằng Python
+MAPPING_VERSION = 2
+# Field chữ được copy_to vào `__text` cho keyword search (số, URL, ngày không đưa vào)
+TEXT_FIELDS = tuple(
+    f.strip() for f in os.getenv("ES_TEXT_FIELDS", "name,university,field_of_study,Scholarship_Name,Country").split(",") if f.strip()
+)
+
+# Index vật lý là `<alias>_v{N}`, code đọc / ghi qua alias `<alias>`.
+# Sau khi dựng lại và swap alias, giữ ES_INDEX_KEEP_VERSIONS bản cũ để rollback, bản cũ hơn bị xoá.
+ES_INDEX_KEEP_VERSIONS = int(os.getenv("ES_INDEX_KEEP_VERSIONS", "1"))
+# Số replica sau khi nạp xong; trống = giữ như bản đang phục vụ (hoặc mặc định của cluster)
+ES_INDEX_REPLICAS = os.getenv("ES_INDEX_REPLICAS")
+# Thời gian tối đa chờ shard của bản mới sẵn sàng (green) trước khi swap
+ES_REBUILD_HEALTH_TIMEOUT = os.getenv("ES_REBUILD_HEALTH_TIMEOUT", "30s")
+
+
+def _index_mappings() -> Dict[str, Any]:
+    text_field = {
+        "type": "text",
+        "analyzer": "vi_std",
+        "copy_to": "__text",
+        # .keyword để sort / term filter (giống dynamic mapping mặc định)
+        "fields": {"keyword": {"type": "keyword", "ignore_above": 256}},
+    }
+    properties: Dict[str, Any] = {field: dict(text_field) for field in TEXT_FIELDS}
+    properties.update({
+        "collection": {"type": "keyword"},
+        # Chỉ là đích của copy_to, không lưu trong _source
+        "__text": {"type": "text", "analyzer": "vi_std"},
+        "url": {"type": "keyword", "index": False},
+        "open_time": {"type": "keyword"},
+        "close_time": {"type": "keyword"},
+        # Bản chuẩn hoá (ISO) của open_time / close_time (DD/MM/YYYY) để sort & range
+        "open_time_date": {"type": "date", "format": DATE_FORMAT},
+        "close_time_date": {"type": "date", "format": DATE_FORMAT},
+        # `amount` tự do ("450 USD") → số đã quy về tiền chung + mã tiền gốc
+        "amount_value": {"type": "double"},
+        "amount_currency": {"type": "keyword"},
+        "active": {"type": "boolean"},
+    })
+    if "Scholarship_Name" in properties:
+        properties["Scholarship_Name"]["fields"] = {"raw": {"type": "keyword"}}
+    return {"_meta": {"mapping_version": MAPPING_VERSION}, "properties": properties}
+
+
+def _mapping_version(mapping: Dict[str, Any]) -> int:
+    return int(mapping.get("mappings", {}).get("_meta", {}).get("mapping_version", 1))
+
+
+async def warm_index_registry(client: AsyncElasticsearch) -> int:
+    """Nạp sẵn danh sách index + alias hiện có (gọi lúc startup). Trả về số index đã biết."""
+    existing = await client.indices.get_alias(index="*", expand_wildcards="open")
+    mappings = await client.indices.get_mapping(index="*", expand_wildcards="open")
+    with _known_indices_lock:
+        for name, info in existing.items():
+            names = [name, *info.get("aliases", {})]
+            _known_indices.update(names)
+            _alias_names.update(info.get("aliases", {}))
+            if _mapping_version(mappings.get(name, {})) < MAPPING_VERSION:
+                _legacy_indices.update(names)
+        return len(_known_indices)
+
+
+def forget_index(index: str) -> None:
+    """Xoá index khỏi registry (khi ES báo index không tồn tại)."""
+    with _known_indices_lock:
+        _known_indices.discard(index)
+        _legacy_indices.discard(index)
+        _alias_names.discard(index)
+
+
+def _write_params(index: str) -> Dict[str, Any]:
+    return {"require_alias": True} if index in _alias_names else {}
+
+
+def is_legacy_index(index: str) -> bool:
+    return index in _legacy_indices
+
+
+async def _create_index(
+    client: AsyncElasticsearch,
+    index: str,
+    *,
+    aliases: Optional[Dict[str, Any]] = None,
+    bulk_load: bool = False,
+) -> None:
+    settings: Dict[str, Any] = {
+        "analysis": {
+            "analyzer": {
+                "vi_std": {"type": "standard", "stopwords": "_none_"}
+            }
+        }
+    }
+    if bulk_load:
+        # Nạp hàng loạt: không refresh, không replica; khôi phục trước khi đưa vào phục vụ
+        settings.update({"refresh_interval": "-1", "number_of_replicas": 0})
+    await client.indices.create(
+        index=index,
+        settings=settings,
+        mappings=_index_mappings(),
+        **({"aliases": aliases} if aliases else {}),
+    )
+
+
+async def index_versions(client: AsyncElasticsearch, alias: str) -> Dict[int, str]:
+    """Các bản `<alias>_v{N}` đang có: {N: tên index}."""
+    settings = await client.indices.get_settings(index=f"{alias}_v*", expand_wildcards="open")
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    return {int(m.group(1)): name for name in settings if (m := pattern.match(name))}
+
+
+async def collection_indices(client: AsyncElasticsearch) -> List[str]:
+    """
+    Tên index mà search đọc theo collection: các alias, cộng index thường chưa chuyển sang alias.
+    Bỏ qua bản `<alias>_v{N}` không gắn alias (giữ để rollback / đang rebuild) và index hệ thống.
+    """
+    existing = await client.indices.get_alias(index="*", expand_wildcards="open")
+    names = set()
+    for name, info in existing.items():
+        aliases = info.get("aliases", {})
+        if aliases:
+            names.update(aliases)
+        elif not re.search(r"_v\d+$", name):
+            names.add(name)
+    return sorted(n for n in names if not n.startswith("."))
+
+
+async def _alias_targets(client: AsyncElasticsearch, alias: str) -> List[str]:
+    try:
+        return list(await client.indices.get_alias(name=alias))
+    except NotFoundError:
+        return []
+
+
+async def ensure_index(client: AsyncElasticsearch, index: str) -> str:
+    if index in _known_indices:
+        return index
+
+    legacy = False
+    if not await client.indices.exists(index=index):
+        # Index mới: tạo bản v{N} + alias cùng tên → về sau dựng lại được bằng rebuild_index
+        versions = await index_versions(client, index)
+        await _create_index(
+            client, f"{index}_v{max(versions, default=0) + 1}", aliases={index: {"is_write_index": True}}
         )
+        alias = True
+    else:
+        mappings = await client.indices.get_mapping(index=index)
+        legacy = all(_mapping_version(m) < MAPPING_VERSION for m in mappings.values())
+        alias = bool(await client.indices.exists_alias(name=index))
+    with _known_indices_lock:
+        _known_indices.add(index)
+        if legacy:
+            _legacy_indices.add(index)
+        if alias:
+            _alias_names.add(index)
     return index
 
 
+async def _search_or_empty(client: AsyncElasticsearch, **params) -> Optional[Dict[str, Any]]:
+    """
+    client.search nhưng nếu index đã bị xoá phía ES thì invalidate registry,
+    tạo lại index và trả về None (kết quả rỗng) thay vì lỗi.
+    """
+    try:
+        return await client.search(**params)
+    except NotFoundError:
+        forget_index(params["index"])
+        await ensure_index(client, params["index"])
+        return None
+
+
 def _catch_all(doc: Dict[str, Any]) -> str:
+    """`__text` kiểu cũ (ghép mọi giá trị scalar) — chỉ dùng cho index chưa migrate sang copy_to."""
     vals: List[str] = []
 
     def walk(x):
@@ -45,113 +224,270 @@ def _catch_all(doc: Dict[str, Any]) -> str:
     return " ".join(vals)
 
 
-def index_one(
-    client: Elasticsearch,
+def parse_date(value: Any) -> Optional[date]:
+    """Parse DD/MM/YYYY (hoặc ISO YYYY-MM-DD) → date. Trả về None nếu không hợp lệ."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        if "/" in value:
+            day, month, year = value.strip().split("/")
+            return date(int(year), int(month), int(day))
+        return date.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+
+def _prepare_source(doc: Dict[str, Any], collection: Optional[str] = None, legacy: bool = False) -> Dict[str, Any]:
+    """
+    Tạo `_source` để index: thêm collection, các field ngày, cờ `active` và số tiền đã chuẩn hoá.
+    Full-text do mapping copy_to lo; chỉ index legacy mới cần dựng `__text` trong Python.
+    """
+    src = {**doc, "__text": _catch_all(doc)} if legacy else dict(doc)
+    if collection:
+        src["collection"] = collection
+
+    for field in DATE_FIELDS:
+        parsed = parse_date(doc.get(field))
+        src[f"{field}_date"] = parsed.isoformat() if parsed else None
+
+    close = parse_date(doc.get("close_time"))
+    src["active"] = close is None or close >= date.today()
+
+    src["amount_value"], src["amount_currency"] = normalize_amount(doc.get("amount"))
+    return src
+
+
+@es_timed("index_one")
+async def index_one(
+    client: AsyncElasticsearch,
     doc: Dict[str, Any],
     *,
     index: str,
     id: Optional[str] = None,
     collection: Optional[str] = None,
 ) -> str:
-    ensure_index(client, index)
+    await ensure_index(client, index)
 
-    payload = dict(doc)
-    payload["__text"] = _catch_all(payload)
-    if collection:
-        payload["collection"] = collection
+    payload = _prepare_source(doc, collection, legacy=is_legacy_index(index))
 
     # Ưu tiên dùng Firestore doc.id để tránh trùng
     es_id = id or doc.get("id") or doc.get("doc_id")
 
-    res = client.index(index=index, id=es_id, document=payload)
+    try:
+        res = await client.index(index=index, id=es_id, document=payload, **_write_params(index))
+    except NotFoundError:
+        # alias đã bị xoá phía ES → tạo lại rồi ghi lại 1 lần
+        forget_index(index)
+        await ensure_index(client, index)
+        res = await client.index(index=index, id=es_id, document=payload, **_write_params(index))
+    await query_cache.invalidate()
     return res["_id"]
 
 
-def index_many(
-    client: Elasticsearch,
-    docs: Iterable[Dict[str, Any]],
+async def _aiter(docs: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if hasattr(docs, "__aiter__"):
+        async for d in docs:
+            yield d
+    else:
+        for d in docs:
+            yield d
+
+
+async def _bulk_actions(
+    docs: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
     *,
     index: str,
     collection: Optional[str] = None,
-) -> int:
-    ensure_index(client, index)
+) -> AsyncIterator[Dict[str, Any]]:
+    legacy = is_legacy_index(index)
+    async for d in _aiter(docs):
+        # Tombstone (doc đã bị xoá mềm ở Firestore) → xoá khỏi ES
+        if d.get("deleted"):
+            yield {"_op_type": "delete", "_index": index, "_id": d.get("id") or d.get("doc_id")}
+            continue
 
-    def gen():
-        for d in docs:
-            src = {**d, "__text": _catch_all(d)}
-            if collection:
-                src["collection"] = collection
+        src = _prepare_source(d, collection, legacy=legacy)
 
-            # Lấy id từ Firestore doc.id nếu có
-            es_id = d.get("id") or d.get("doc_id")
+        # Lấy id từ Firestore doc.id nếu có
+        es_id = d.get("id") or d.get("doc_id")
 
-            yield {"_op_type": "index", "_index": index, "_id": es_id, "_source": src}
+        yield {"_op_type": "index", "_index": index, "_id": es_id, "_source": src}
 
-    success, _ = helpers.bulk(client, gen(), stats_only=True)
-    return success
 
+def _is_missing_index(info: Dict[str, Any]) -> bool:
+    return info.get("status") == 404 and (info.get("error") or {}).get("type") == "index_not_found_exception"
 
-def search_keyword(
-    client: Elasticsearch,
-    q: str,
+
+async def _bulk_items(
+    client: AsyncElasticsearch,
+    docs: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
     *,
     index: str,
-    size: int = 10,
-    offset: int = 0,
     collection: Optional[str] = None,
-) -> Dict[str, Any]:
-    ensure_index(client, index)
+    **bulk_kwargs: Any,
+) -> AsyncIterator[Tuple[bool, Dict[str, Any]]]:
+    """
+    helpers.async_streaming_bulk (không raise lỗi từng doc), ghi với require_alias nếu `index` là alias.
+    Alias đã bị xoá phía ES → tạo lại index ngay khi gặp lỗi 404 đầu tiên (các chunk sau ghi bình
+    thường), các doc đã bị từ chối được ghi lại 1 lần ở cuối. Chỉ giữ action của các doc đang
+    chờ kết quả (≈ 1 chunk) để có thể ghi lại.
+    """
+    pending: Dict[str, Dict[str, Any]] = {}
 
-    must = [
-        {
-            "match": {
-                "__text": {
-                "query": q,
-                "operator": "or",
-                "fuzziness": "AUTO"
-                }
-            }
-        }
-    ]
-    if collection:
-        must.append({"term": {"collection": collection}})
+    async def actions() -> AsyncIterator[Dict[str, Any]]:
+        async for action in _bulk_actions(docs, index=index, collection=collection):
+            if action["_op_type"] != "delete" and action.get("_id"):
+                pending[action["_id"]] = action
+            yield action
+
+    missing: List[Dict[str, Any]] = []
+    recreated = False
+    async for ok, item in helpers.async_streaming_bulk(
+        client,
+        actions(),
+        raise_on_error=False,
+        raise_on_exception=False,
+        **_write_params(index),
+        **bulk_kwargs,
+    ):
+        op, info = next(iter(item.items()))
+        action = pending.pop(info.get("_id"), None)
+        if not ok and op != "delete" and action is not None and _is_missing_index(info):
+            if not recreated:
+                forget_index(index)
+                await ensure_index(client, index)
+                recreated = True
+            missing.append(action)
+            continue
+        yield ok, item
+
+    if missing:
+        async for ok, item in helpers.async_streaming_bulk(
+            client, missing, raise_on_error=False, raise_on_exception=False, **_write_params(index), **bulk_kwargs
+        ):
+            yield ok, item
 
-    res = client.search(
-        index=index,
-        query={"bool": {"must": must}},
-        size=size,
-        from_=offset,
-    )
-    hits = [
-        {"id": h["_id"], "score": h["_score"], "source": h["_source"]}
-        for h in res["hits"]["hits"]
-    ]
-    return {"total": res["hits"]["total"]["value"], "items": hits}
 
-def filter_advanced(
-    client: Elasticsearch,
+@es_timed("index_many")
+async def index_many(
+    client: AsyncElasticsearch,
+    docs: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
     *,
     index: str,
-    filters: List[Dict[str, Any]],
     collection: Optional[str] = None,
-    inter_field_operator: Literal["AND", "OR"] = "AND",
-    size: int = 10,
-    offset: int = 0,
-    sort_field: Optional[str] = None,
-    sort_order: Literal["asc", "desc"] = "asc",
-) -> Dict[str, Any]:
+    max_retries: int = 3,
+) -> Tuple[int, List[Dict[str, Any]]]:
     """
-    Hàm lọc tổng quát, hỗ trợ logic kết hợp linh hoạt và lọc theo collection.
+    Bulk index `docs`, trả về (số doc thành công, lỗi từng doc dạng {id, status, error}).
+    Doc bị ES từ chối vì quá tải (429) được retry với backoff tối đa `max_retries` lần;
+    lỗi còn lại không làm dừng cả bulk.
+    """
+    await ensure_index(client, index)
 
-    Backward-compatible filter modes per clause via optional key `mode`:
-    - "match" (default): Use `match` query joining values into a single string.
-    - "term": Use `terms` query for exact keyword filtering (expects list `values`).
-    - "range": Use `range` query with optional numeric bounds via `min`/`max`.
+    success = 0
+    errors = []
+    async for ok, item in _bulk_items(client, docs, index=index, collection=collection, max_retries=max_retries):
+        op, info = next(iter(item.items()))
+        if ok or (op == "delete" and info.get("status") == 404):
+            success += 1
+            continue
+        errors.append({"id": info.get("_id"), "status": info.get("status"), "error": info.get("error")})
+    await query_cache.invalidate()
+    return success, errors
+
+
+async def stream_index(
+    client: AsyncElasticsearch,
+    docs: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+    *,
+    index: str,
+    collection: Optional[str] = None,
+    chunk_size: int = 500,
+    max_chunk_bytes: int = 10 * 1024 * 1024,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Index `docs` (generator / async generator) theo từng chunk qua helpers.async_streaming_bulk.
+    Chỉ giữ tối đa 1 chunk (chunk_size docs / max_chunk_bytes) trong bộ nhớ.
+    Yield thống kê cho từng chunk: indexed, failed, docs_per_sec, errors (tối đa 5).
+    Lỗi từng document không làm dừng pipeline. Tombstone (`deleted=True`) được
+    chuyển thành thao tác delete; xoá doc không tồn tại (404) không tính là lỗi.
     """
-    ensure_index(client, index)
+    await ensure_index(client, index)
 
-    # Xây dựng các mệnh đề lọc từ input `filters`
-    clauses = []
+    chunk_no = 0
+    indexed = failed = 0
+    errors: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+
+    def _stats() -> Dict[str, Any]:
+        elapsed = time.perf_counter() - started
+        return {
+            "chunk": chunk_no,
+            "indexed": indexed,
+            "failed": failed,
+            "seconds": round(elapsed, 3),
+            "docs_per_sec": round((indexed + failed) / elapsed, 1) if elapsed > 0 else None,
+            "errors": errors[:5],
+        }
+
+    async for ok, item in _bulk_items(
+        client,
+        docs,
+        index=index,
+        collection=collection,
+        chunk_size=chunk_size,
+        max_chunk_bytes=max_chunk_bytes,
+    ):
+        if ok or item.get("delete", {}).get("status") == 404:
+            indexed += 1
+        else:
+            failed += 1
+            errors.append(item)
+
+        if indexed + failed >= chunk_size:
+            chunk_no += 1
+            ES_CALL_SECONDS.labels("stream_index_chunk").observe(time.perf_counter() - started)
+            # Kết quả search/match đã cache có thể cũ → xoá sau mỗi chunk
+            await query_cache.invalidate()
+            yield _stats()
+            indexed = failed = 0
+            errors = []
+            started = time.perf_counter()
+
+    if indexed + failed:
+        chunk_no += 1
+        ES_CALL_SECONDS.labels("stream_index_chunk").observe(time.perf_counter() - started)
+        await query_cache.invalidate()
+        yield _stats()
+
+
+def _keyword_clause(q: str) -> Dict[str, Any]:
+    return {
+        "match": {
+            "__text": {
+                "query": q,
+                "operator": "or",
+                "fuzziness": "AUTO",
+            }
+        }
+    }
+
+
+def _sort_clause(sort_field: str, sort_order: Literal["asc", "desc"] = "asc") -> List[Any]:
+    """
+    Field ngày (open_time / close_time) sort trên bản `<field>_date` kiểu date,
+    field text khác sort trên `.keyword`. Doc thiếu giá trị luôn nằm cuối; hoà thì theo điểm.
+    """
+    if sort_field in DATE_FIELDS:
+        clause = {f"{sort_field}_date": {"order": sort_order, "missing": "_last", "unmapped_type": "date"}}
+    else:
+        # Use .keyword field for text fields to enable sorting
+        clause = {f"{sort_field}.keyword": {"order": sort_order, "unmapped_type": "keyword"}}
+    return [clause, "_score"]
+
+
+def _build_clauses(filters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    clauses: List[Dict[str, Any]] = []
     for f in filters:
         field = f["field"]
         mode = str(f.get("mode", "match")).lower()
@@ -168,6 +504,8 @@ def filter_advanced(
                 rng["gte"] = f.get("min")
             if f.get("max") is not None:
                 rng["lte"] = f.get("max")
+            if rng and f.get("format"):
+                rng["format"] = f["format"]
             if rng:
                 clauses.append({"range": {field: rng}})
         else:
@@ -176,7 +514,200 @@ def filter_advanced(
             intra_operator = f.get("operator", "OR").lower()
             query_text = " ".join(map(str, values))
             clauses.append({"match": {field: {"query": query_text, "operator": intra_operator}}})
-    
+    return clauses
+
+
+def _source_params(source_includes: Optional[List[str]]) -> Dict[str, Any]:
+    """None → toàn bộ _source (trừ field nội bộ); [] → không lấy _source; list → chỉ các field đó."""
+    if source_includes is None:
+        return {"source_excludes": SOURCE_EXCLUDES}
+    if not source_includes:
+        return {"source": False}
+    return {"source_includes": source_includes, "source_excludes": SOURCE_EXCLUDES}
+
+
+def _to_hits(res: Dict[str, Any]) -> Dict[str, Any]:
+    hits = [
+        {
+            "id": h["_id"],
+            "score": h["_score"],
+            "source": h.get("_source", {}),
+            **({"matched": h["matched_queries"]} if "matched_queries" in h else {}),
+        }
+        for h in res["hits"]["hits"]
+    ]
+    return {"total": res["hits"]["total"]["value"], "items": hits}
+
+
+def _encode_cursor(pit_id: Optional[str], search_after: Optional[List[Any]], position: int, fingerprint: str) -> str:
+    raw = json.dumps({"pit": pit_id, "sa": search_after, "o": position, "f": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {"pit": data["pit"], "sa": data["sa"], "o": int(data["o"]), "f": data["f"]}
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _cursor_sort(sort: Optional[List[Any]]) -> List[Any]:
+    return list(sort or ["_score"]) + [{"_shard_doc": "asc"}]
+
+
+def _cursor_fingerprint(index: str, query: Dict[str, Any], sort: Optional[List[Any]]) -> str:
+    # Cursor chỉ hợp lệ với đúng query / sort / index đã tạo ra nó
+    return hashlib.sha1(
+        json.dumps({"index": index, "query": query, "sort": _cursor_sort(sort)}, sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+
+
+async def _close_pit(client: AsyncElasticsearch, pit_id: str) -> None:
+    # PIT giữ segment trên mọi shard tới khi hết keep_alive → đóng ngay khi không còn cursor nào trỏ tới
+    try:
+        await client.close_point_in_time(id=pit_id)
+    except Exception as e:
+        print(f"⚠️ Failed to close point-in-time: {e}")
+
+
+async def _run_search(
+    client: AsyncElasticsearch,
+    *,
+    index: str,
+    query: Dict[str, Any],
+    size: int,
+    offset: int,
+    sort: Optional[List[Any]],
+    source_includes: Optional[List[str]],
+    after: Optional[str],
+    use_cursor: bool,
+) -> Dict[str, Any]:
+    """
+    Thực thi search theo 1 trong 2 chế độ phân trang:
+    - offset (`from_`/`size`, mặc định, giữ tương thích cũ; bị giới hạn bởi max_result_window);
+    - cursor (`use_cursor` hoặc có `after`): trả thêm `next_cursor` (opaque) nếu còn trang sau.
+      Trang đầu vẫn chạy kiểu offset và không mở gì trên ES: cursor của nó chỉ ghi vị trí trang sau.
+      Point-in-time chỉ được mở khi client thực sự gửi `after`; các trang sau đi theo `search_after`
+      (tiebreaker `_shard_doc`), PIT được đóng ở trang cuối.
+    """
+    params: Dict[str, Any] = {"query": query, "size": size, **_source_params(source_includes)}
+    if not after:
+        res = await _search_or_empty(client, index=index, from_=offset, **({"sort": sort} if sort else {}), **params)
+        out = {"total": 0, "items": []} if res is None else _to_hits(res)
+        if use_cursor:
+            position = offset + len(out["items"])
+            has_next = len(out["items"]) == size and position < out["total"]
+            out["next_cursor"] = _encode_cursor(None, None, position, _cursor_fingerprint(index, query, sort)) if has_next else None
+        return out
+
+    cur = _decode_cursor(after)
+    if cur["f"] != _cursor_fingerprint(index, query, sort):
+        raise ValueError("Cursor does not match this query")
+    pit_id, search_after, position = cur["pit"], cur["sa"], cur["o"]
+    if pit_id is None:
+        try:
+            pit_id = (await client.open_point_in_time(index=index, keep_alive=ES_PIT_KEEP_ALIVE))["id"]
+        except NotFoundError:
+            forget_index(index)
+            await ensure_index(client, index)
+            return {"total": 0, "items": [], "next_cursor": None}
+
+    try:
+        res = await client.search(
+            pit={"id": pit_id, "keep_alive": ES_PIT_KEEP_ALIVE},
+            sort=_cursor_sort(sort),
+            # Trang thứ 2 (cursor từ trang offset) chưa có sort value → bắt đầu từ vị trí đã ghi
+            **({"search_after": search_after} if search_after else {"from_": position}),
+            **params,
+        )
+    except NotFoundError:
+        raise ValueError("Cursor expired, restart pagination")
+
+    out = _to_hits(res)
+    hits = res["hits"]["hits"]
+    pit_id = res.get("pit_id", pit_id)
+    position += len(hits)
+    total = res["hits"]["total"]
+    has_next = len(hits) == size and (position < total["value"] or total.get("relation") == "gte")
+    if has_next:
+        out["next_cursor"] = _encode_cursor(pit_id, hits[-1]["sort"], position, cur["f"])
+    else:
+        out["next_cursor"] = None
+        await _close_pit(client, pit_id)
+    return out
+
+
+@es_timed("search_keyword")
+async def search_keyword(
+    client: AsyncElasticsearch,
+    q: str,
+    *,
+    index: str,
+    size: int = 10,
+    offset: int = 0,
+    collection: Optional[str] = None,
+    sort_field: Optional[str] = None,
+    sort_order: Literal["asc", "desc"] = "asc",
+    source_includes: Optional[List[str]] = None,
+    after: Optional[str] = None,
+    use_cursor: bool = False,
+    active_only: bool = False,
+) -> Dict[str, Any]:
+    await ensure_index(client, index)
+
+    must = [_keyword_clause(q)]
+    if collection:
+        must.append({"term": {"collection": collection}})
+    if active_only:
+        must.append(ACTIVE_FILTER)
+
+    return await _run_search(
+        client,
+        index=index,
+        query={"bool": {"must": must}},
+        size=size,
+        offset=offset,
+        sort=_sort_clause(sort_field, sort_order) if sort_field else None,
+        source_includes=source_includes,
+        after=after,
+        use_cursor=use_cursor,
+    )
+
+@es_timed("filter_advanced")
+async def filter_advanced(
+    client: AsyncElasticsearch,
+    *,
+    index: str,
+    filters: List[Dict[str, Any]],
+    collection: Optional[str] = None,
+    inter_field_operator: Literal["AND", "OR"] = "AND",
+    size: int = 10,
+    offset: int = 0,
+    sort_field: Optional[str] = None,
+    sort_order: Literal["asc", "desc"] = "asc",
+    source_includes: Optional[List[str]] = None,
+    after: Optional[str] = None,
+    use_cursor: bool = False,
+    active_only: bool = False,
+) -> Dict[str, Any]:
+    """
+    Hàm lọc tổng quát, hỗ trợ logic kết hợp linh hoạt và lọc theo collection.
+
+    Backward-compatible filter modes per clause via optional key `mode`:
+    - "match" (default): Use `match` query joining values into a single string.
+    - "term": Use `terms` query for exact keyword filtering (expects list `values`).
+    - "range": Use `range` query with optional bounds via `min`/`max` (and optional date `format`).
+
+    `source_includes` giới hạn các field `_source` trả về (None = tất cả); `__text` luôn bị loại.
+    `after` / `use_cursor`: phân trang bằng cursor (PIT + search_after) thay cho `offset`.
+    `active_only`: chỉ lấy học bổng còn hạn (cờ `active`).
+    """
+    await ensure_index(client, index)
+
+    # Xây dựng các mệnh đề lọc từ input `filters`
+    clauses = _build_clauses(filters)
+
     query_body: Dict[str, Any] = {"bool": {}}
     
     # Logic kết hợp các mệnh đề lọc chính
@@ -196,32 +727,330 @@ def filter_advanced(
             query_body["bool"]["filter"] = []
         # Thêm điều kiện lọc collection
         query_body["bool"]["filter"].append({"term": {"collection": collection}})
+    if active_only:
+        query_body["bool"].setdefault("filter", []).append(ACTIVE_FILTER)
 
 
     # Trả về rỗng nếu không có bất kỳ điều kiện nào
     if not query_body["bool"]:
         return {"total": 0, "items": []}
 
-    # Prepare search parameters
-    search_params = {
-        "index": index,
-        "query": query_body,
-        "size": size,
-        "from_": offset,
-    }
-    
-    # Add sorting if specified
-    if sort_field:
-        # Use .keyword field for text fields to enable sorting
-        sort_field_name = f"{sort_field}.keyword" if sort_field else sort_field
-        search_params["sort"] = [
-            {sort_field_name: {"order": sort_order, "unmapped_type": "keyword"}}
+    # Thực thi query
+    return await _run_search(
+        client,
+        index=index,
+        query=query_body,
+        size=size,
+        offset=offset,
+        sort=_sort_clause(sort_field, sort_order) if sort_field else None,
+        source_includes=source_includes,
+        after=after,
+        use_cursor=use_cursor,
+    )
+
+
+@es_timed("search_combined")
+async def search_combined(
+    client: AsyncElasticsearch,
+    q: str,
+    *,
+    index: str,
+    filters: List[Dict[str, Any]],
+    collection: Optional[str] = None,
+    inter_field_operator: Literal["AND", "OR"] = "AND",
+    size: int = 10,
+    offset: int = 0,
+    sort_field: Optional[str] = None,
+    sort_order: Literal["asc", "desc"] = "asc",
+    source_includes: Optional[List[str]] = None,
+    after: Optional[str] = None,
+    use_cursor: bool = False,
+    active_only: bool = False,
+) -> Dict[str, Any]:
+    """
+    Keyword + bộ lọc trong 1 query duy nhất: `must` chấm điểm theo keyword,
+    `filter` chứa các mệnh đề lọc (không ảnh hưởng điểm). ES trả về đúng thứ tự,
+    đúng phân trang và đúng total chỉ với 1 request.
+    """
+    await ensure_index(client, index)
+
+    clauses = _build_clauses(filters)
+    filter_clauses: List[Dict[str, Any]] = []
+    if clauses:
+        if inter_field_operator == "AND":
+            filter_clauses.extend(clauses)
+        else:  # OR: ít nhất 1 mệnh đề khớp
+            filter_clauses.append({"bool": {"should": clauses, "minimum_should_match": 1}})
+    if collection:
+        filter_clauses.append({"term": {"collection": collection}})
+    if active_only:
+        filter_clauses.append(ACTIVE_FILTER)
+
+    query_body: Dict[str, Any] = {"bool": {"must": [_keyword_clause(q)]}}
+    if filter_clauses:
+        query_body["bool"]["filter"] = filter_clauses
+
+    return await _run_search(
+        client,
+        index=index,
+        query=query_body,
+        size=size,
+        offset=offset,
+        sort=_sort_clause(sort_field, sort_order) if sort_field else None,
+        source_includes=source_includes,
+        after=after,
+        use_cursor=use_cursor,
+    )
+
+
+@es_timed("search_weighted")
+async def search_weighted(
+    client: AsyncElasticsearch,
+    *,
+    index: str,
+    criteria: List[Dict[str, Any]],
+    collection: Optional[str] = None,
+    decay: Optional[Dict[str, Any]] = None,
+    size: int = 10,
+    offset: int = 0,
+    source_includes: Optional[List[str]] = None,
+    after: Optional[str] = None,
+    use_cursor: bool = False,
+    active_only: bool = False,
+) -> Dict[str, Any]:
+    """
+    Chấm điểm theo nhiều tiêu chí có trọng số, hoàn toàn phía ES, trong 1 query.
+
+    - `criteria`: [{"weight": float, "filters": [filter dict có thêm "name"]}]. Tiêu chí khớp khi
+      ít nhất 1 filter khớp và cộng đúng `weight` điểm (constant_score). Doc phải khớp ≥ 1 tiêu chí.
+    - `decay` (tuỳ chọn): {"field", "scale", "weight", "name", "offset"?} → cộng thêm tối đa `weight`
+      điểm theo độ gần của ngày `field` (gauss, origin = hôm nay); chỉ tính doc có ngày >= hôm nay.
+    - Mỗi filter được đặt `_name` → hit trả về `matched` (ES matched_queries).
+    Kết quả có thêm `max_score` = tổng trọng số tối đa, để chuẩn hoá điểm về [0, 1].
+    """
+    await ensure_index(client, index)
+
+    should: List[Dict[str, Any]] = []
+    max_score = 0.0
+    for criterion in criteria:
+        named = [
+            {"constant_score": {"filter": clause, "_name": f["name"]}}
+            for f in criterion["filters"]
+            for clause in _build_clauses([f])
         ]
+        if not named:
+            continue
+        weight = float(criterion.get("weight", 1.0))
+        should.append({"constant_score": {"filter": {"bool": {"should": named}}, "boost": weight}})
+        max_score += weight
 
-    # Thực thi query
-    res = client.search(**search_params)
-    hits = [
-        {"id": h["_id"], "score": h["_score"], "source": h["_source"]}
-        for h in res["hits"]["hits"]
-    ]
-    return {"total": res["hits"]["total"]["value"], "items": hits}
+    if not should:
+        return {"total": 0, "items": [], "max_score": 0.0}
+
+    query_body: Dict[str, Any] = {"bool": {"must": [{"bool": {"should": should, "minimum_should_match": 1}}]}}
+    if collection:
+        query_body["bool"]["filter"] = [{"term": {"collection": collection}}]
+    if active_only:
+        query_body["bool"].setdefault("filter", []).append(ACTIVE_FILTER)
+    if decay:
+        gauss = {"origin": "now", "scale": decay["scale"], "decay": 0.5}
+        if decay.get("offset"):
+            gauss["offset"] = decay["offset"]
+        query_body["bool"]["should"] = [{
+            "function_score": {
+                "query": {"range": {decay["field"]: {"gte": "now/d"}}},
+                "functions": [{"gauss": {decay["field"]: gauss}}],
+                "boost_mode": "replace",
+                "boost": float(decay["weight"]),
+                "_name": decay["name"],
+            }
+        }]
+        max_score += float(decay["weight"])
+
+    res = await _run_search(
+        client,
+        index=index,
+        query=query_body,
+        size=size,
+        offset=offset,
+        sort=None,
+        source_includes=source_includes,
+        after=after,
+        use_cursor=use_cursor,
+    )
+    res["max_score"] = max_score
+    return res
+
+
+@es_timed("refresh_active_flags")
+async def refresh_active_flags(client: AsyncElasticsearch, index: Union[str, List[str]] = ES_SEARCH_INDEX) -> int:
+    """
+    Tắt cờ `active` của học bổng đã quá hạn (và gắn cờ cho doc cũ chưa có) bằng 1 update_by_query.
+    Chỉ đụng tới doc cần đổi → chạy lại nhiều lần / nhiều replica vẫn an toàn. Trả về số doc cập nhật.
+    `index` là alias của collection (xem collection_indices): không đụng tới bản cũ giữ để rollback
+    hay `_vN` đang dựng.
+    """
+    res = await client.update_by_query(
+        index=index,
+        ignore_unavailable=True,  # alias chưa được tạo (chưa sync lần nào) → 0 doc, không lỗi
+        conflicts="proceed",
+        refresh=True,
+        query={"bool": {"should": [
+            {"bool": {"must_not": [{"exists": {"field": "active"}}]}},
+            {"bool": {"filter": [
+                {"term": {"active": True}},
+                {"range": {"close_time_date": {"lt": "now/d"}}},
+            ]}},
+        ], "minimum_should_match": 1}},
+        script={
+            "lang": "painless",
+            "source": (
+                "def close = ctx._source.close_time_date;"
+                "ctx._source.active = close == null || close.compareTo(params.today) >= 0;"
+            ),
+            "params": {"today": date.today().isoformat()},
+        },
+    )
+    updated = int(res.get("updated", 0))
+    if updated:
+        await query_cache.invalidate()
+    return updated
+
+
+@es_timed("migrate_text_mapping")
+async def migrate_text_mapping(client: AsyncElasticsearch, index: str) -> Dict[str, Any]:
+    """
+    Chuyển index legacy (`__text` dựng sẵn trong _source) sang mapping copy_to bằng rebuild_index
+    (reindex từ bản hiện tại, bỏ `__text`, rồi swap alias) → code đọc/ghi theo tên cũ không đổi.
+    Doc ghi vào index cũ trong lúc reindex có thể sót: chạy sync full sau khi migrate.
+    """
+    if not await client.indices.exists(index=index):
+        raise ValueError(f"Index '{index}' does not exist")
+    mappings = await client.indices.get_mapping(index=index)
+    if all(_mapping_version(m) >= MAPPING_VERSION for m in mappings.values()):
+        return {"index": index, "migrated": False, "reason": "already on copy_to mapping"}
+
+    result = await rebuild_index(client, index)
+    return {"index": index, "migrated": True, "target": result["target"], "reindexed": result["loaded"]}
+
+
+async def _reindex_from(client: AsyncElasticsearch, sources: List[str], target: str) -> int:
+    res = await client.reindex(
+        source={"index": sources},
+        dest={"index": target},
+        # `__text` của index legacy giờ do copy_to lo
+        script={"lang": "painless", "source": "ctx._source.remove('__text')"},
+        conflicts="proceed",
+        slices="auto",
+        wait_for_completion=True,
+    )
+    if res.get("failures"):
+        raise RuntimeError(f"Reindex {sources} → '{target}' failed: {res['failures'][:3]}")
+    return int(res.get("total", 0))
+
+
+async def _warm_index(client: AsyncElasticsearch, index: str) -> None:
+    """Chạy vài query giống traffic thật để nạp sẵn cache / global ordinals trước khi swap."""
+    await client.search(index=index, query=ACTIVE_FILTER, sort=_sort_clause("close_time"), size=10)
+    await client.search(index=index, query=_keyword_clause("scholarship"), size=10)
+    await client.search(index=index, size=0, aggs={"currency": {"terms": {"field": "amount_currency"}}})
+
+
+@es_timed("rebuild_index")
+async def rebuild_index(
+    client: AsyncElasticsearch,
+    alias: str,
+    load: Optional[Callable[[str], Awaitable[int]]] = None,
+    *,
+    keep: int = ES_INDEX_KEEP_VERSIONS,
+) -> Dict[str, Any]:
+    """
+    Dựng lại `alias` không downtime:
+    1. tạo `<alias>_v{N+1}` với mapping hiện tại, refresh tắt, 0 replica;
+    2. nạp dữ liệu bằng `await load(target)` (trả về số doc), mặc định reindex từ bản đang phục vụ;
+    3. khôi phục refresh / replica, refresh, chờ shard sẵn sàng (green, hoặc yellow nếu thiếu node), làm nóng;
+    4. chuyển alias (kể cả write index) sang bản mới trong 1 thao tác nguyên tử;
+    5. dọn bản cũ (giữ `keep` bản gần nhất để rollback).
+    Lỗi trước bước 4 thì xoá bản mới, alias giữ nguyên. Doc ghi vào alias trong lúc nạp
+    vẫn vào bản cũ → caller tự bù sau khi swap (vd sync delta).
+    """
+    current = await _alias_targets(client, alias)
+    # `alias` có thể đang là index thường (tạo trước khi dùng alias) → thay luôn index đó khi swap
+    concrete = not current and await client.indices.exists(index=alias)
+    sources = current or ([alias] if concrete else [])
+    if load is None and not sources:
+        raise ValueError(f"Index '{alias}' does not exist")
+
+    replicas: Optional[int] = int(ES_INDEX_REPLICAS) if ES_INDEX_REPLICAS else None
+    if replicas is None and sources:
+        res = await client.indices.get_settings(index=sources[0], name="index.number_of_replicas")
+        replicas = int(next(iter(res.values()))["settings"]["index"]["number_of_replicas"])
+
+    versions = await index_versions(client, alias)
+    target = f"{alias}_v{max(versions, default=0) + 1}"
+    await _create_index(client, target, bulk_load=True)
+    started = time.perf_counter()
+    try:
+        loaded = await (load(target) if load else _reindex_from(client, sources, target))
+        await client.indices.put_settings(
+            index=target, settings={"index": {"refresh_interval": None, "number_of_replicas": replicas}}
+        )
+        await client.indices.refresh(index=target)
+        # Không đủ data node cho replica (vd cluster 1 node) thì không bao giờ green → chỉ chờ yellow.
+        # Hết thời gian chờ ES trả 408 kèm `timed_out` → bỏ qua status đó và tự kiểm tra.
+        data_nodes = (await client.cluster.health())["number_of_data_nodes"]
+        wait_for = "green" if data_nodes > (1 if replicas is None else replicas) else "yellow"
+        health = await client.options(ignore_status=408).cluster.health(
+            index=target, wait_for_status=wait_for, timeout=ES_REBUILD_HEALTH_TIMEOUT
+        )
+        if health.get("timed_out"):
+            print(f"⚠️ '{target}' not {wait_for} after {ES_REBUILD_HEALTH_TIMEOUT} (status {health.get('status')}), swapping anyway")
+        await _warm_index(client, target)
+    except BaseException:
+        await client.indices.delete(index=target, ignore_unavailable=True)
+        forget_index(target)
+        raise
+
+    actions: List[Dict[str, Any]] = [{"add": {"index": target, "alias": alias, "is_write_index": True}}]
+    if concrete:
+        actions.append({"remove_index": {"index": alias}})
+    else:
+        actions += [{"remove": {"index": old, "alias": alias}} for old in current]
+    await client.indices.update_aliases(actions=actions)
+    with _known_indices_lock:
+        _legacy_indices.discard(alias)
+        _known_indices.update((alias, target))
+        _alias_names.add(alias)
+    await query_cache.invalidate()
+    print(f"✅ Alias '{alias}' → '{target}' ({loaded} docs in {time.perf_counter() - started:.1f}s)")
+
+    deleted = await gc_index_versions(client, alias, keep=keep)
+    return {
+        "alias": alias,
+        "target": target,
+        "previous": sources,
+        "loaded": loaded,
+        "seconds": round(time.perf_counter() - started, 3),
+        "deleted": deleted,
+    }
+
+
+@es_timed("gc_index_versions")
+async def gc_index_versions(client: AsyncElasticsearch, alias: str, *, keep: int = ES_INDEX_KEEP_VERSIONS) -> List[str]:
+    """
+    Xoá các bản `<alias>_v{N}` cũ hơn bản đang gắn alias, giữ lại `keep` bản mới nhất trong số đó.
+    Bản mới hơn (vd đang được dựng dở) không bị đụng tới. Trả về tên các index đã xoá.
+    """
+    versions = await index_versions(client, alias)
+    targets = set(await _alias_targets(client, alias))
+    live = [v for v, name in versions.items() if name in targets]
+    if not live:
+        return []
+    older = sorted((v for v in versions if v < min(live)), reverse=True)
+    doomed = [versions[v] for v in older[max(keep, 0):]]
+    if doomed:
+        await client.indices.delete(index=doomed)
+        for name in doomed:
+            forget_index(name)
+        print(f"🗑️ Deleted old index versions of '{alias}': {', '.join(doomed)}")
+    return doomed
@@ -1,8 +1,12 @@
 import re
 from typing import Optional, Dict, Any, List, Iterable
-from firebase_admin import firestore
+from firebase_admin import firestore, firestore_async
+from google.api_core.exceptions import AlreadyExists
+from services.metrics_svc import firestore_timed
 
 _COLLECTION_RE = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+# Số id tối đa cho 1 lần đọc nhiều doc (REST batch, GraphQL `documents`)
+BATCH_GET_MAX_IDS = 500
 
 def _ensure_valid_collection(collection: str) -> str:
     if not _COLLECTION_RE.match(collection):
@@ -10,22 +14,43 @@ def _ensure_valid_collection(collection: str) -> str:
     return collection
 
 def _db():
-    return firestore.client()
+    return firestore_async.client()
 
-def save_one_raw(collection: str, data: Dict[str, Any]) -> str:
+def _stamp(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Gắn `updated_at` (server timestamp) để sync ES có thể query theo delta."""
+    return {**data, "updated_at": firestore.SERVER_TIMESTAMP}
+
+@firestore_timed("save_one_raw")
+async def save_one_raw(collection: str, data: Dict[str, Any]) -> str:
     col = _ensure_valid_collection(collection)
     db = _db()
     ref = db.collection(col).document()  # auto-id
-    ref.set(data)
+    await ref.set(_stamp(data))
     return ref.id
 
-def save_with_id(collection: str, doc_id: str, data: Dict[str, Any]) -> str:
+@firestore_timed("save_with_id")
+async def save_with_id(collection: str, doc_id: str, data: Dict[str, Any]) -> str:
     col = _ensure_valid_collection(collection)
     db = _db()
-    db.collection(col).document(doc_id).set(data)
+    await db.collection(col).document(doc_id).set(_stamp(data))
     return doc_id
 
-def save_many_raw(collection: str, rows: Iterable[Dict[str, Any]]) -> List[str]:
+@firestore_timed("create_if_absent")
+async def create_if_absent(collection: str, doc_id: str, data: Dict[str, Any]) -> bool:
+    """
+    Tạo doc nếu chưa tồn tại, trong 1 round trip (`document.create()` có precondition).
+    Trả về False nếu doc đã có (không ghi đè) — an toàn khi nhiều request chạy đồng thời.
+    """
+    col = _ensure_valid_collection(collection)
+    db = _db()
+    try:
+        await db.collection(col).document(doc_id).create(_stamp(data))
+        return True
+    except AlreadyExists:
+        return False
+
+@firestore_timed("save_many_raw")
+async def save_many_raw(collection: str, rows: Iterable[Dict[str, Any]]) -> List[str]:
     col = _ensure_valid_collection(collection)
     db = _db()
     col_ref = db.collection(col)
@@ -37,22 +62,58 @@ def save_many_raw(collection: str, rows: Iterable[Dict[str, Any]]) -> List[str]:
 
     for row in rows:
         ref = col_ref.document()  # auto-id
-        batch.set(ref, row)
+        batch.set(ref, _stamp(row))
         ids.append(ref.id)
         ops += 1
 
         if ops >= CHUNK:
-            batch.commit()
+            await batch.commit()
             batch = db.batch()
             ops = 0
 
     if ops:
-        batch.commit()
+        await batch.commit()
 
     return ids
 
-def get_one_raw(collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+@firestore_timed("get_one_raw")
+async def get_one_raw(collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+    col = _ensure_valid_collection(collection)
+    db = _db()
+    snap = await db.collection(col).document(doc_id).get()
+    if not snap.exists:
+        return None
+    data = snap.to_dict()
+    return None if data.get("deleted") else data
+
+@firestore_timed("get_many_raw")
+async def get_many_raw(collection: str, doc_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Đọc nhiều doc trong 1 RPC (`get_all`, batched). Kết quả giữ đúng thứ tự `doc_ids`,
+    phần tử None nếu doc không tồn tại hoặc đã bị xoá mềm. Id trùng chỉ đọc 1 lần.
+    """
     col = _ensure_valid_collection(collection)
     db = _db()
-    snap = db.collection(col).document(doc_id).get()
-    return snap.to_dict() if snap.exists else None
+    unique_ids = list(dict.fromkeys(doc_ids))
+    if not unique_ids:
+        return []
+    col_ref = db.collection(col)
+
+    found: Dict[str, Dict[str, Any]] = {}
+    async for snap in db.get_all([col_ref.document(doc_id) for doc_id in unique_ids]):
+        if snap.exists:
+            data = snap.to_dict()
+            if not data.get("deleted"):
+                found[snap.id] = data
+    return [found.get(doc_id) for doc_id in doc_ids]
+
+@firestore_timed("delete_one")
+async def delete_one(collection: str, doc_id: str) -> str:
+    """
+    Xoá mềm: ghi tombstone (`deleted=True` + `updated_at`) thay vì xoá hẳn,
+    để lần sync delta tiếp theo biết mà xoá document khỏi ES.
+    """
+    col = _ensure_valid_collection(collection)
+    db = _db()
+    await db.collection(col).document(doc_id).set(_stamp({"deleted": True}), merge=True)
+    return doc_id
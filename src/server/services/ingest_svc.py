@@ -0,0 +1,117 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from elasticsearch import AsyncElasticsearch
+from google.api_core.exceptions import (
+    Aborted,
+    DeadlineExceeded,
+    GoogleAPICallError,
+    InternalServerError,
+    ResourceExhausted,
+    ServiceUnavailable,
+)
+
+from services.es_svc import ensure_index, index_many
+from services.firestore_svc import _db, _ensure_valid_collection, _stamp
+from services.sync_svc import is_syncable
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "400"))  # Firestore batch tối đa 500 ops
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "0.2"))
+
+# Lỗi tạm thời của Firestore → commit lại cả batch (set theo id cố định nên idempotent)
+_RETRYABLE = (Aborted, DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable)
+
+
+async def _commit_with_retry(db, writes: List[Tuple[Any, Dict[str, Any]]], max_retries: int) -> Optional[str]:
+    """Commit 1 batch, retry với exponential backoff. Trả về thông báo lỗi nếu vẫn thất bại."""
+    for attempt in range(max_retries + 1):
+        batch = db.batch()
+        for ref, data in writes:
+            batch.set(ref, _stamp(data))
+        try:
+            await batch.commit()
+            return None
+        except _RETRYABLE as e:
+            if attempt == max_retries:
+                return str(e)
+            await asyncio.sleep(INGEST_RETRY_BACKOFF * 2 ** attempt)
+        except GoogleAPICallError as e:
+            return str(e)
+
+
+async def ingest_many(
+    client: AsyncElasticsearch,
+    collection: str,
+    rows: List[Dict[str, Any]],
+    *,
+    batch_size: int = INGEST_BATCH_SIZE,
+    concurrency: int = INGEST_CONCURRENCY,
+    max_retries: int = INGEST_MAX_RETRIES,
+) -> Dict[str, Any]:
+    """
+    Ghi `rows` vào Firestore rồi index ngay sang ES (index cùng tên collection):
+    - chia thành batch `batch_size`, tối đa `concurrency` batch commit song song;
+    - batch nào commit xong thì index batch đó qua `index_many`, không chờ batch khác;
+    - batch Firestore lỗi tạm thời được retry; row Firestore lỗi thì không đưa lên ES.
+    Row đã vào Firestore nhưng lỗi ES vẫn được lần sync delta sau bù lại (có `updated_at`).
+    Collection bị loại khỏi sync (is_syncable, vd `users`) chỉ ghi Firestore, `es` = "skipped".
+    Trả về tổng hợp + trạng thái từng row theo đúng thứ tự đầu vào.
+    """
+    col = _ensure_valid_collection(collection)
+    db = _db()
+    col_ref = db.collection(col)
+    syncable = is_syncable(col)
+    if syncable:
+        await ensure_index(client, col)
+
+    refs = [col_ref.document() for _ in rows]  # auto-id, sinh trước để ES dùng cùng id
+    results: List[Dict[str, Any]] = [
+        {"id": ref.id, "status": "pending", "firestore": None, "es": None, "error": None}
+        for ref in refs
+    ]
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(start: int) -> None:
+        positions = range(start, min(start + batch_size, len(rows)))
+        async with sem:
+            err = await _commit_with_retry(db, [(refs[i], rows[i]) for i in positions], max_retries)
+            if err:
+                for i in positions:
+                    results[i].update(status="failed", firestore="failed", es="skipped", error=err)
+                return
+            for i in positions:
+                results[i]["firestore"] = "ok"
+            if not syncable:
+                for i in positions:
+                    results[i].update(status="ok", es="skipped")
+                return
+
+            try:
+                _, es_errors = await index_many(
+                    client,
+                    [{**rows[i], "id": refs[i].id} for i in positions],
+                    index=col,
+                    collection=col,
+                    max_retries=max_retries,
+                )
+            except Exception as e:
+                es_errors = [{"id": refs[i].id, "error": str(e)} for i in positions]
+            failed = {e["id"]: e.get("error") for e in es_errors}
+            for i in positions:
+                if refs[i].id in failed:
+                    results[i].update(status="partial", es="failed", error=str(failed[refs[i].id]))
+                else:
+                    results[i].update(status="ok", es="ok")
+
+    await asyncio.gather(*(_run(start) for start in range(0, len(rows), batch_size)))
+
+    return {
+        "total": len(rows),
+        "firestore_written": sum(r["firestore"] == "ok" for r in results),
+        "es_indexed": sum(r["es"] == "ok" for r in results),
+        "failed": sum(r["status"] != "ok" for r in results),
+        "rows": results,
+    }
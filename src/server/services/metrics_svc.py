@@ -0,0 +1,91 @@
+"""
+Metrics Prometheus cho hot path: ES, Firestore, xác thực token, GraphQL, sync.
+Latency HTTP theo route do prometheus-fastapi-instrumentator lo (xem app.py), expose ở /metrics.
+Các decorator / `track` đồng thời mở span tracing (services/trace_svc.py) cho cùng call.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from services.trace_svc import span
+
+# Các call nhanh (cache, ES search) nằm ở vùng ms, bulk / reindex có thể tới vài giây
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+ES_CALL_SECONDS = Histogram(
+    "scholarlens_es_call_seconds", "Elasticsearch call latency", ["call"], buckets=LATENCY_BUCKETS
+)
+ES_CALL_ERRORS = Counter("scholarlens_es_call_errors_total", "Elasticsearch calls that raised", ["call"])
+
+FIRESTORE_CALL_SECONDS = Histogram(
+    "scholarlens_firestore_call_seconds", "Firestore call latency", ["call"], buckets=LATENCY_BUCKETS
+)
+FIRESTORE_CALL_ERRORS = Counter("scholarlens_firestore_call_errors_total", "Firestore calls that raised", ["call"])
+
+AUTH_VERIFY_SECONDS = Histogram(
+    "scholarlens_auth_verify_seconds", "Firebase ID token verification latency", ["cache"], buckets=LATENCY_BUCKETS
+)
+AUTH_VERIFY_FAILURES = Counter("scholarlens_auth_verify_failures_total", "Rejected Firebase ID tokens")
+
+GRAPHQL_OPERATION_SECONDS = Histogram(
+    "scholarlens_graphql_operation_seconds",
+    "GraphQL operation latency",
+    ["operation", "type"],
+    buckets=LATENCY_BUCKETS,
+)
+GRAPHQL_OPERATION_ERRORS = Counter(
+    "scholarlens_graphql_operation_errors_total", "GraphQL operations returning errors", ["operation", "type"]
+)
+
+SYNC_DOCS = Counter("scholarlens_sync_docs_total", "Docs processed by Firestore → ES sync", ["collection", "outcome"])
+SYNC_DOCS_PER_SEC = Gauge("scholarlens_sync_docs_per_second", "Throughput of the last sync chunk", ["collection"])
+SYNC_RUNS = Counter("scholarlens_sync_runs_total", "Finished collection syncs", ["collection", "mode", "status"])
+
+
+@contextmanager
+def track(histogram: Histogram, errors: Counter, label: str, span_name: str) -> Iterator[None]:
+    """
+    Đo thời gian 1 khối code vào `histogram{label}` (exception thì tăng `errors{label}`)
+    và mở span `span_name` nếu request đang được trace.
+    """
+    started = time.perf_counter()
+    try:
+        with span(span_name):
+            yield
+    except Exception:
+        errors.labels(label).inc()
+        raise
+    finally:
+        histogram.labels(label).observe(time.perf_counter() - started)
+
+
+def _timed(histogram: Histogram, errors: Counter, label: str, span_name: str):
+    # Resolve label 1 lần lúc decorate → mỗi lần gọi chỉ còn perf_counter + observe
+    observe = histogram.labels(label).observe
+    count_error = errors.labels(label).inc
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            except Exception:
+                count_error()
+                raise
+            finally:
+                observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def es_timed(call: str):
+    return _timed(ES_CALL_SECONDS, ES_CALL_ERRORS, call, f"es.{call}")
+
+
+def firestore_timed(call: str):
+    return _timed(FIRESTORE_CALL_SECONDS, FIRESTORE_CALL_ERRORS, call, f"firestore.{call}")
@@ -0,0 +1,248 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from elasticsearch import AsyncElasticsearch
+from firebase_admin import firestore_async
+from google.cloud.firestore import async_transactional
+from services.sync_svc import is_syncable, sync_collection
+
+# Lease trong Firestore để chỉ 1 replica chạy sync nền
+LEASE_COLLECTION = "_sync_locks"
+LEASE_NAME = "firestore_to_es"
+SYNC_LEASE_TTL_SECONDS = float(os.getenv("SYNC_LEASE_TTL_SECONDS", "120"))
+REPLICA_ID = os.getenv("REPLICA_ID") or f"{socket.gethostname()}:{os.getpid()}"
+# Số collection được sync đồng thời (mỗi collection tự có SYNC_BULK_WORKERS bulk worker)
+SYNC_COLLECTION_CONCURRENCY = max(1, int(os.getenv("SYNC_COLLECTION_CONCURRENCY", "4")))
+
+
+class SyncCancelled(Exception):
+    pass
+
+
+_state_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "status": "idle",           # idle | running | failed
+    "replica": REPLICA_ID,
+    "lease_holder": None,
+    "started_at": None,
+    "finished_at": None,
+    "current_collections": [],
+    "collections_done": 0,
+    "collections_total": 0,
+    "docs_done": 0,
+    "docs_failed": 0,
+    "docs_total": None,
+    "docs_per_sec": None,
+    "eta_seconds": None,
+    "error": None,
+    "last_result": None,
+}
+_task: Optional[asyncio.Task] = None
+
+
+def get_sync_state() -> Dict[str, Any]:
+    with _state_lock:
+        return dict(_state)
+
+
+def _update(**fields) -> None:
+    with _state_lock:
+        _state.update(fields)
+
+
+# ======================
+# Lease
+# ======================
+
+async def acquire_lease(ttl: float = SYNC_LEASE_TTL_SECONDS) -> bool:
+    """
+    Lấy (hoặc gia hạn) lease qua Firestore transaction.
+    Thành công nếu lease chưa có, đã hết hạn, hoặc đang thuộc replica này.
+    """
+    db = firestore_async.client()
+    ref = db.collection(LEASE_COLLECTION).document(LEASE_NAME)
+
+    @async_transactional
+    async def _txn(transaction) -> bool:
+        snap = await ref.get(transaction=transaction)
+        now = datetime.now(timezone.utc)
+        if snap.exists:
+            lease = snap.to_dict()
+            if lease.get("holder") != REPLICA_ID and lease.get("expires_at") and lease["expires_at"] > now:
+                _update(lease_holder=lease.get("holder"))
+                return False
+        transaction.set(ref, {"holder": REPLICA_ID, "expires_at": now + timedelta(seconds=ttl)})
+        _update(lease_holder=REPLICA_ID)
+        return True
+
+    return await _txn(db.transaction())
+
+
+async def release_lease() -> None:
+    db = firestore_async.client()
+    ref = db.collection(LEASE_COLLECTION).document(LEASE_NAME)
+
+    @async_transactional
+    async def _txn(transaction) -> None:
+        snap = await ref.get(transaction=transaction)
+        if snap.exists and snap.to_dict().get("holder") == REPLICA_ID:
+            transaction.delete(ref)
+
+    await _txn(db.transaction())
+    _update(lease_holder=None)
+
+
+# ======================
+# Job
+# ======================
+
+async def _count_docs(coll_ref) -> Optional[int]:
+    try:
+        return int((await coll_ref.count().get())[0][0].value)
+    except Exception:
+        return None
+
+
+async def sync_all_collections(client: AsyncElasticsearch) -> Dict[str, Any]:
+    """
+    Sync các Firestore collection được phép (xem sync_svc.is_syncable) → ES, mỗi collection
+    1 index cùng tên, tối đa SYNC_COLLECTION_CONCURRENCY collection cùng lúc.
+    Cập nhật state (docs_done, docs/s, ETA) sau mỗi chunk. Lỗi của 1 collection không
+    dừng các collection khác; mất lease thì huỷ toàn bộ.
+    """
+    db = firestore_async.client()
+    collections = []
+    async for c in db.collections():
+        if is_syncable(c.id):
+            collections.append(c)
+        elif not c.id.startswith("_"):
+            print(f"ℹ️ Skipping collection '{c.id}' (excluded from sync)")
+
+    counts = await asyncio.gather(*(_count_docs(c) for c in collections))
+    docs_total = sum(counts) if all(n is not None for n in counts) else None
+    started = time.perf_counter()
+    last_renew = time.monotonic()
+    _update(collections_total=len(collections), docs_total=docs_total)
+
+    async def on_chunk(stats: Dict[str, Any]) -> None:
+        nonlocal last_renew
+        # Gia hạn lease định kỳ khi sync chạy lâu
+        if time.monotonic() - last_renew > SYNC_LEASE_TTL_SECONDS / 3:
+            if not await acquire_lease():
+                raise SyncCancelled("Lost sync lease to another replica")
+            last_renew = time.monotonic()
+
+        with _state_lock:
+            _state["docs_done"] += stats["indexed"]
+            _state["docs_failed"] += stats["failed"]
+            done = _state["docs_done"] + _state["docs_failed"]
+            elapsed = time.perf_counter() - started
+            rate = done / elapsed if elapsed > 0 else None
+            _state["docs_per_sec"] = round(rate, 1) if rate else None
+            if rate and docs_total is not None:
+                # full sync: ETA theo tổng số doc; delta sync đọc ít hơn nên ETA là cận trên
+                _state["eta_seconds"] = round(max(docs_total - done, 0) / rate, 1)
+
+    sem = asyncio.Semaphore(SYNC_COLLECTION_CONCURRENCY)
+
+    async def sync_one(coll_ref) -> Dict[str, Any]:
+        coll_name = coll_ref.id
+        async with sem:
+            with _state_lock:
+                _state["current_collections"] = [*_state["current_collections"], coll_name]
+            try:
+                summary = await sync_collection(client, coll_ref, on_chunk=on_chunk)
+                summary.pop("chunks", None)
+                if summary["indexed"] or summary["failed"]:
+                    print(f"✅ Synced {summary['indexed']} docs ({summary['failed']} failed) from Firestore collection '{coll_name}' → ES index '{coll_name}'")
+                else:
+                    print(f"⚠️ No changed documents in collection '{coll_name}'")
+            except SyncCancelled:
+                raise
+            except Exception as e:
+                print(f"❌ Error syncing collection '{coll_name}': {e}")
+                summary = {"collection": coll_name, "indexed": 0, "failed": 0, "error": str(e)}
+            finally:
+                with _state_lock:
+                    _state["current_collections"] = [c for c in _state["current_collections"] if c != coll_name]
+                    _state["collections_done"] += 1
+            return summary
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(sync_one(c)) for c in collections]
+    except ExceptionGroup as eg:
+        raise eg.exceptions[0]
+
+    return {"collections": [t.result() for t in tasks]}
+
+
+async def _run(client: AsyncElasticsearch) -> None:
+    try:
+        if not await acquire_lease():
+            print(f"ℹ️ Sync lease held by '{_state['lease_holder']}', skipping background sync")
+            _update(status="idle")
+            return
+    except Exception as e:
+        _update(status="failed", error=f"Could not acquire sync lease: {e}", finished_at=datetime.now(timezone.utc).isoformat())
+        return
+
+    try:
+        result = await sync_all_collections(client)
+        failed = [c["collection"] for c in result["collections"] if c.get("error")]
+        _update(
+            status="idle",
+            last_result=result,
+            eta_seconds=0,
+            error=f"Sync failed for collections: {', '.join(failed)}" if failed else None,
+        )
+    except asyncio.CancelledError:
+        _update(status="idle", error="Sync cancelled (shutdown)")
+        raise
+    except Exception as e:
+        print(f"❌ Error syncing Firestore → ES: {e}")
+        _update(status="failed", error=str(e))
+    finally:
+        _update(current_collections=[], finished_at=datetime.now(timezone.utc).isoformat())
+        try:
+            await release_lease()
+        except Exception:
+            pass
+
+
+def start_background_sync(client: AsyncElasticsearch) -> bool:
+    """Chạy sync trong asyncio task nền. Trả về False nếu đang có 1 sync chạy trong process này."""
+    global _task
+    with _state_lock:
+        if _state["status"] == "running":
+            return False
+        _state.update(
+            status="running",
+            started_at=datetime.now(timezone.utc).isoformat(),
+            finished_at=None,
+            current_collections=[],
+            collections_done=0,
+            collections_total=0,
+            docs_done=0,
+            docs_failed=0,
+            docs_total=None,
+            docs_per_sec=None,
+            eta_seconds=None,
+            error=None,
+        )
+    _task = asyncio.create_task(_run(client), name="es-sync")
+    return True
+
+
+async def stop_background_sync(timeout: float = 10) -> None:
+    """Huỷ task sync đang chạy (gọi khi shutdown)."""
+    if _task and not _task.done():
+        _task.cancel()
+        try:
+            await asyncio.wait_for(_task, timeout=timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            pass
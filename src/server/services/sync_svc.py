@@ -0,0 +1,293 @@
+import asyncio
+import fnmatch
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from elasticsearch import AsyncElasticsearch
+from firebase_admin import firestore, firestore_async
+from google.cloud.firestore_v1.base_query import FieldFilter
+from services.es_svc import ensure_index, rebuild_index, stream_index
+from services.firestore_svc import _ensure_valid_collection
+from services.metrics_svc import SYNC_DOCS, SYNC_DOCS_PER_SEC, SYNC_RUNS
+
+SYNC_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "500"))
+SYNC_MAX_CHUNK_BYTES = int(os.getenv("SYNC_MAX_CHUNK_BYTES", str(10 * 1024 * 1024)))
+# Số bulk request chạy song song cho 1 collection, và số doc đọc trước từ Firestore trong lúc chờ bulk
+SYNC_BULK_WORKERS = max(1, int(os.getenv("SYNC_BULK_WORKERS", "2")))
+SYNC_PREFETCH_DOCS = int(os.getenv("SYNC_PREFETCH_DOCS", str(4 * SYNC_CHUNK_SIZE)))
+
+
+def _patterns(value: str) -> List[str]:
+    return [p.strip() for p in value.split(",") if p.strip()]
+
+
+# Collection nào được đẩy lên ES (glob, phân cách bằng dấu phẩy). Allowlist rỗng = tất cả;
+# denylist mặc định chặn `users` (dữ liệu cá nhân, không phục vụ search).
+# Collection bắt đầu bằng "_" (checkpoint, lock) luôn bị loại.
+SYNC_COLLECTIONS = _patterns(os.getenv("SYNC_COLLECTIONS", ""))
+SYNC_EXCLUDE_COLLECTIONS = _patterns(os.getenv("SYNC_EXCLUDE_COLLECTIONS", "users"))
+
+# Checkpoint store: "firestore" (doc trong collection _sync_checkpoints) hoặc "file" (JSON local)
+SYNC_CHECKPOINT_STORE = os.getenv("SYNC_CHECKPOINT_STORE", "firestore").lower()
+SYNC_CHECKPOINT_PATH = os.getenv("SYNC_CHECKPOINT_PATH", ".sync_checkpoints.json")
+# Lùi watermark của full sync một chút để bù lệch đồng hồ giữa server và Firestore
+SYNC_CLOCK_SKEW_SECONDS = float(os.getenv("SYNC_CLOCK_SKEW_SECONDS", "5"))
+
+CHECKPOINT_COLLECTION = "_sync_checkpoints"
+
+_file_lock = threading.Lock()
+
+
+# ======================
+# Checkpoint store
+# ======================
+
+def _read_checkpoint_file() -> Dict[str, str]:
+    if not os.path.exists(SYNC_CHECKPOINT_PATH):
+        return {}
+    with open(SYNC_CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_checkpoint_file(collection: str) -> Optional[str]:
+    with _file_lock:
+        return _read_checkpoint_file().get(collection)
+
+
+def _save_checkpoint_file(collection: str, watermark: str) -> None:
+    with _file_lock:
+        data = _read_checkpoint_file()
+        data[collection] = watermark
+        tmp = f"{SYNC_CHECKPOINT_PATH}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, SYNC_CHECKPOINT_PATH)
+
+
+async def load_checkpoint(collection: str) -> Optional[datetime]:
+    """Watermark `updated_at` của lần sync thành công gần nhất (None nếu chưa sync lần nào)."""
+    if SYNC_CHECKPOINT_STORE == "file":
+        # File I/O là blocking → chạy trong thread để không chặn event loop
+        raw = await asyncio.to_thread(_load_checkpoint_file, collection)
+        return datetime.fromisoformat(raw) if raw else None
+
+    snap = await firestore_async.client().collection(CHECKPOINT_COLLECTION).document(collection).get()
+    if not snap.exists:
+        return None
+    return snap.to_dict().get("watermark")
+
+
+async def save_checkpoint(collection: str, watermark: datetime) -> None:
+    if SYNC_CHECKPOINT_STORE == "file":
+        await asyncio.to_thread(_save_checkpoint_file, collection, watermark.isoformat())
+        return
+
+    await firestore_async.client().collection(CHECKPOINT_COLLECTION).document(collection).set(
+        {"watermark": watermark, "synced_at": firestore.SERVER_TIMESTAMP}
+    )
+
+
+# ======================
+# Sync
+# ======================
+
+def is_syncable(collection: str) -> bool:
+    """Collection có được sync lên ES không (theo SYNC_COLLECTIONS / SYNC_EXCLUDE_COLLECTIONS)."""
+    if collection.startswith("_"):
+        return False
+    if SYNC_COLLECTIONS and not any(fnmatch.fnmatchcase(collection, p) for p in SYNC_COLLECTIONS):
+        return False
+    return not any(fnmatch.fnmatchcase(collection, p) for p in SYNC_EXCLUDE_COLLECTIONS)
+
+
+async def iter_collection_docs(query, seen: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Đọc lần lượt từng document của collection/query (không load hết vào list).
+    Nếu truyền `seen`, ghi lại `updated_at` lớn nhất đã đọc vào seen["max_updated_at"].
+    """
+    async for doc in query.stream():
+        data = doc.to_dict() or {}
+        data["id"] = doc.id  # gắn id để tránh trùng
+
+        if seen is not None:
+            ts = data.get("updated_at")
+            if isinstance(ts, datetime) and (seen.get("max_updated_at") is None or ts > seen["max_updated_at"]):
+                seen["max_updated_at"] = ts
+        yield data
+
+
+_END = object()
+
+
+async def index_pipelined(
+    client: AsyncElasticsearch,
+    docs: AsyncIterator[Dict[str, Any]],
+    *,
+    index: str,
+    collection: Optional[str],
+    on_chunk: Callable[[Dict[str, Any]], Awaitable[None]],
+    workers: int = SYNC_BULK_WORKERS,
+    prefetch: int = SYNC_PREFETCH_DOCS,
+) -> None:
+    """
+    Producer/consumer: 1 task đọc `docs` (Firestore stream) vào hàng đợi có giới hạn `prefetch`,
+    `workers` task lấy từ hàng đợi và bulk index qua stream_index → đọc và index chạy chồng lên
+    nhau, tối đa `workers` bulk request cùng lúc cho index này. Gọi `on_chunk(stats)` sau mỗi chunk.
+    Lỗi ở producer hoặc worker huỷ các task còn lại và được raise lại nguyên dạng.
+    """
+    await ensure_index(client, index)  # tạo 1 lần trước khi các worker chạy song song
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(prefetch, workers))
+
+    async def produce() -> None:
+        async for d in docs:
+            await queue.put(d)
+        for _ in range(workers):
+            await queue.put(_END)
+
+    async def drain() -> AsyncIterator[Dict[str, Any]]:
+        while (d := await queue.get()) is not _END:
+            yield d
+
+    async def consume() -> None:
+        async for stats in stream_index(
+            client,
+            drain(),
+            index=index,
+            collection=collection,
+            chunk_size=SYNC_CHUNK_SIZE,
+            max_chunk_bytes=SYNC_MAX_CHUNK_BYTES,
+        ):
+            await on_chunk(stats)
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(produce())
+            for _ in range(workers):
+                tg.create_task(consume())
+    except ExceptionGroup as eg:
+        raise eg.exceptions[0]
+
+
+async def sync_collection(
+    client: AsyncElasticsearch,
+    coll_ref,
+    *,
+    full: bool = False,
+    on_chunk: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Stream 1 Firestore collection → ES index cùng tên.
+
+    Mặc định chạy delta: chỉ đọc các doc có `updated_at >= watermark` của checkpoint.
+    Chưa có checkpoint (hoặc full=True) thì đọc toàn bộ collection.
+    Tombstone (`deleted=True`) được xoá khỏi ES. Watermark chỉ được tiến lên
+    khi không có doc nào lỗi, để lần sau thử lại.
+    Log throughput / lỗi theo từng chunk (và await `on_chunk(stats)` nếu có),
+    trả về tổng kết kèm danh sách chunk.
+    """
+    coll_name = coll_ref.id
+    watermark = None if full else await load_checkpoint(coll_name)
+    started_at = datetime.now(timezone.utc)
+
+    if watermark is None:
+        mode = "full"
+        query = coll_ref
+    else:
+        mode = "delta"
+        # >= thay vì > để không bỏ sót doc trùng timestamp (index lại là idempotent)
+        query = coll_ref.where(filter=FieldFilter("updated_at", ">=", watermark)).order_by("updated_at")
+
+    seen: Dict[str, Any] = {}
+    summary: Dict[str, Any] = {
+        "collection": coll_name,
+        "mode": mode,
+        "indexed": 0,
+        "failed": 0,
+        "chunks": [],
+    }
+
+    async def record(stats: Dict[str, Any]) -> None:
+        summary["indexed"] += stats["indexed"]
+        summary["failed"] += stats["failed"]
+        # các worker đánh số chunk riêng → đánh lại theo thứ tự hoàn thành
+        stats["chunk"] = len(summary["chunks"]) + 1
+        summary["chunks"].append(stats)
+        SYNC_DOCS.labels(coll_name, "indexed").inc(stats["indexed"])
+        SYNC_DOCS.labels(coll_name, "failed").inc(stats["failed"])
+        if stats["docs_per_sec"] is not None:
+            SYNC_DOCS_PER_SEC.labels(coll_name).set(stats["docs_per_sec"])
+        print(
+            f"↻ '{coll_name}' ({mode}) chunk {stats['chunk']}: {stats['indexed']} ok, "
+            f"{stats['failed']} failed, {stats['docs_per_sec']} docs/s"
+        )
+        if on_chunk:
+            await on_chunk(stats)
+
+    await index_pipelined(
+        client,
+        iter_collection_docs(query, seen),
+        index=coll_name,        # mỗi collection map sang 1 index cùng tên
+        collection=coll_name,   # gắn tên collection để filter khi search
+        on_chunk=record,
+    )
+
+    if not summary["failed"]:
+        if mode == "full":
+            # Full scan không theo thứ tự updated_at → dùng mốc bắt đầu sync
+            new_watermark = started_at - timedelta(seconds=SYNC_CLOCK_SKEW_SECONDS)
+        else:
+            new_watermark = seen.get("max_updated_at") or watermark
+        await save_checkpoint(coll_name, new_watermark)
+        summary["watermark"] = new_watermark.isoformat()
+
+    SYNC_RUNS.labels(coll_name, mode, "partial" if summary["failed"] else "ok").inc()
+    return summary
+
+
+async def sync_collection_by_name(client: AsyncElasticsearch, collection: str, *, full: bool = False) -> Dict[str, Any]:
+    col = _ensure_valid_collection(collection)
+    if not is_syncable(col):
+        raise ValueError(f"Collection '{col}' is excluded from sync")
+    return await sync_collection(client, firestore_async.client().collection(col), full=full)
+
+
+async def rebuild_collection_index(client: AsyncElasticsearch, collection: str) -> Dict[str, Any]:
+    """
+    Full resync không downtime: đọc toàn bộ collection từ Firestore vào bản index mới
+    (es_svc.rebuild_index), swap alias, rồi bù các doc được ghi trong lúc dựng (lúc đó vẫn vào bản cũ).
+    """
+    col = _ensure_valid_collection(collection)
+    if not is_syncable(col):
+        raise ValueError(f"Collection '{col}' is excluded from sync")
+    coll_ref = firestore_async.client().collection(col)
+    since = datetime.now(timezone.utc) - timedelta(seconds=SYNC_CLOCK_SKEW_SECONDS)
+
+    async def load(target: str) -> int:
+        totals = {"indexed": 0, "failed": 0}
+
+        async def record(stats: Dict[str, Any]) -> None:
+            totals["indexed"] += stats["indexed"]
+            totals["failed"] += stats["failed"]
+
+        await index_pipelined(client, iter_collection_docs(coll_ref), index=target, collection=col, on_chunk=record)
+        if totals["failed"]:
+            # không swap sang bản thiếu dữ liệu
+            raise RuntimeError(f"{totals['failed']} docs failed to index into '{target}'")
+        return totals["indexed"]
+
+    result = await rebuild_index(client, col, load)
+
+    caught_up = {"indexed": 0, "failed": 0}
+
+    async def record_catch_up(stats: Dict[str, Any]) -> None:
+        caught_up["indexed"] += stats["indexed"]
+        caught_up["failed"] += stats["failed"]
+
+    query = coll_ref.where(filter=FieldFilter("updated_at", ">=", since)).order_by("updated_at")
+    await index_pipelined(client, iter_collection_docs(query), index=col, collection=col, on_chunk=record_catch_up)
+    if not caught_up["failed"]:
+        await save_checkpoint(col, since)
+    return {**result, "caught_up": caught_up}
+
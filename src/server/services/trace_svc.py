@@ -0,0 +1,179 @@
+"""
+Tracing nhẹ theo mô hình OpenTelemetry (trace / span lồng nhau, trace_id + span_id + parent),
+không phụ thuộc SDK ngoài. Span được truyền qua contextvars nên đi theo cả asyncio task con.
+
+- TRACE_EXPORTER: none | stdout | file (mỗi trace 1 dòng JSON, field theo OTLP/JSON: traceId,
+  spanId, parentSpanId, name, startTimeUnixNano, endTimeUnixNano, attributes, status).
+- TRACE_SAMPLE_RATE: tỉ lệ request được export (0..1).
+- Header `X-Debug-Timing: 1` (chỉ khi bật TRACE_DEBUG_HEADER=true, mặc định tắt): luôn trace request đó và trả
+  bảng thời gian từng bước trong `extensions.timing` của response GraphQL.
+Không có trace đang chạy thì `span()` gần như không tốn gì; tắt hết (exporter none / sample 0
+và không bật header debug) thì app không gắn cả TraceMiddleware.
+"""
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()  # none | stdout | file
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_DEBUG_HEADER = os.getenv("TRACE_DEBUG_HEADER", "false").lower() == "true"
+DEBUG_HEADER = "x-debug-timing"
+TRACING_ENABLED = (TRACE_EXPORTER != "none" and TRACE_SAMPLE_RATE > 0) or TRACE_DEBUG_HEADER
+
+_file_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class Trace:
+    def __init__(self, *, sampled: bool, debug: bool):
+        self.trace_id = secrets.token_hex(16)
+        self.sampled = sampled
+        self.debug = debug
+        self.spans: List[Span] = []
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spans": [
+                {
+                    "traceId": self.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "startTimeUnixNano": s.start_ns,
+                    "endTimeUnixNano": s.end_ns,
+                    "attributes": s.attributes,
+                    "status": {"code": "ERROR", "message": s.error} if s.error else {"code": "OK"},
+                }
+                for s in self.spans
+            ],
+        }
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """Bảng thời gian cho debug: mỗi span 1 dòng, theo thứ tự bắt đầu, kèm độ sâu."""
+        if not self.spans:
+            return []
+        origin = min(s.start_ns for s in self.spans)
+        depth: Dict[str, int] = {}
+        rows = []
+        for s in sorted(self.spans, key=lambda s: s.start_ns):
+            depth[s.span_id] = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+            end = s.end_ns or time.time_ns()
+            rows.append({
+                "name": s.name,
+                "depth": depth[s.span_id],
+                "start_ms": round((s.start_ns - origin) / 1e6, 3),
+                "duration_ms": round((end - s.start_ns) / 1e6, 3),
+                **({"error": s.error} if s.error else {}),
+            })
+        return rows
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    s = Span(name, parent.span_id if parent else None, attributes)
+    trace.spans.append(s)  # thêm ngay để breakdown thấy cả span chưa kết thúc
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, *, debug: bool = False, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """Bắt đầu trace gốc (1 / request). Không được sample và không debug → không làm gì."""
+    sampled = TRACE_EXPORTER != "none" and random.random() < TRACE_SAMPLE_RATE
+    if not (sampled or debug):
+        yield None
+        return
+    trace = Trace(sampled=sampled, debug=debug)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        if trace.sampled:
+            export(trace)
+
+
+def export(trace: Trace) -> None:
+    line = json.dumps(trace.to_otlp(), default=str, ensure_ascii=False)
+    if TRACE_EXPORTER == "stdout":
+        print(line)
+    elif TRACE_EXPORTER == "file":
+        with _file_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class TraceMiddleware:
+    """
+    Trace gốc cho mỗi HTTP request (theo sampling, hoặc luôn trace khi có header X-Debug-Timing: 1),
+    gắn `X-Trace-Id` vào response. ASGI thuần: không qua BaseHTTPMiddleware nên không tốn thêm
+    task / stream body cho mỗi request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, path = scope["method"], scope["path"]
+        debug = TRACE_DEBUG_HEADER and (DEBUG_HEADER.encode(), b"1") in scope["headers"]
+        with start_trace(f"{method} {path}", debug=debug, **{"http.method": method, "http.target": path}) as trace:
+            if trace is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_trace_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    trace.spans[0].set("http.status_code", message["status"])
+                    headers = [*message.get("headers", []), (b"x-trace-id", trace.trace_id.encode())]
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
@@ -0,0 +1,5 @@
+# Cho phép `pytest` chạy từ src/server hoặc từ gốc repo: import `services.*` như app.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
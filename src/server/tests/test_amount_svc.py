@@ -0,0 +1,43 @@
+import pytest
+
+from services.amount_svc import amount_range_filter, parse_amount
+
+
+@pytest.mark.parametrize(
+    "text, value, currency",
+    [
+        # Mã ISO phải đứng riêng, không khớp chuỗi con
+        ("1000 academic allowance", 1000.0, None),
+        ("Scholarship for Europe: 10,000", 10000.0, None),
+        ("Học bổng Đức 1000", 1000.0, None),
+        ("Học bổng Đức 1000 EUR", 1000.0, "EUR"),
+        ("1,000 USD", 1000.0, "USD"),
+        ("1,000 cad", 1000.0, "CAD"),
+        ("$2.5k", 2500.0, "USD"),
+        ("€1.500", 1500.0, "EUR"),
+        ("500.000đ", 500000.0, "VND"),
+        # Hệ số tiếng Việt không ghi đơn vị → VND
+        ("15 triệu", 15e6, "VND"),
+        ("2 tỷ", 2e9, "VND"),
+        ("30 nghìn", 30e3, "VND"),
+        ("20 triệu VNĐ", 20e6, "VND"),
+        ("30 nghìn yen", 30e3, "JPY"),
+        ("1m USD", 1e6, "USD"),
+        ("50% tuition", None, None),
+        ("Full tuition", None, None),
+    ],
+)
+def test_parse_amount(text, value, currency):
+    assert parse_amount(text) == (value, currency)
+
+
+@pytest.mark.parametrize(
+    "min_amount, expected_min",
+    [
+        ("20 triệu", 780.0),
+        ("20 triệu VNĐ", 780.0),
+        ("1,000 USD", 1000.0),
+    ],
+)
+def test_amount_range_filter_min(min_amount, expected_min):
+    assert amount_range_filter(min_amount, None)["min"] == pytest.approx(expected_min)